@@ -0,0 +1,63 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+from synthetic import generate_frames
+from data_processor import DataProcessor
+from product_recommender import ProductRecommender
+from push_generator import PushGenerator
+from event_stream import EventProcessor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def event_lines(transactions, transfers):
+    """Операции обоих видов как JSON-строки в схеме CSV, по возрастанию даты"""
+    records = []
+    for frame in (transactions, transfers):
+        frame = frame.assign(date=frame['date'].dt.strftime('%Y-%m-%d %H:%M:%S')).astype(object)
+        records.extend(frame.where(frame.notna(), None).to_dict('records'))
+    records.sort(key=lambda record: record['date'])
+    return [json.dumps(record, ensure_ascii=False, default=float) for record in records]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк потоковой обработки операций")
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--rows-per-client', type=int, default=100)
+    parser.add_argument('--target', type=float, default=50000, help="Ожидаемая пропускная способность, событий/с")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    clients, transactions, transfers = generate_frames(args.clients, args.rows_per_client)
+    lines = event_lines(transactions, transfers)
+
+    processor = DataProcessor()
+    recommender = ProductRecommender('config/product_config.json')
+    events = EventProcessor(processor, recommender, PushGenerator('templates/push_templates.json'))
+    events.seed(clients)
+
+    start = time.perf_counter()
+    pushes = sum(1 for _ in events.process_lines(lines))
+    elapsed = time.perf_counter() - start
+    rate = len(lines) / elapsed
+    print(f"Событий: {len(lines)} за {elapsed:.2f} с, {rate:.0f} в секунду, пушей: {pushes}")
+
+    # После всех событий скоры должны совпасть с пакетным пересчётом
+    features = processor.feature_engine.build(clients, transactions, transfers).to_frame()
+    expected = recommender.score_batch(features)
+    actual = np.array([events.clients[code].scores for code in features['client_code']])
+    if not np.allclose(actual, expected, rtol=1e-9, atol=1e-6):
+        print("ОШИБКА: скоры расходятся с пакетным пересчётом")
+        return 1
+    if rate < args.target:
+        print(f"ОШИБКА: пропускная способность ниже {args.target:.0f} событий/с")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import os
+import sys
+import argparse
+import tracemalloc
+
+from synthetic import generate_frames
+from data_processor import DataProcessor
+from feature_store import FeatureStore
+from service import RecommendationService
+
+
+def traced(build):
+    """Объект и объём памяти, выделенной при его построении и удерживаемой им"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Память на клиента для разных представлений признаков")
+    parser.add_argument('--clients', type=int, default=20000)
+    parser.add_argument('--rows-per-client', type=int, default=60)
+    args = parser.parse_args(argv)
+
+    # Конфиг и шаблоны читаются относительно корня репозитория
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+    clients, transactions, transfers = generate_frames(args.clients, args.rows_per_client)
+    features = DataProcessor().feature_engine.build(clients, transactions, transfers).to_frame()
+    n = len(features)
+    print(f"Клиентов: {n}, колонок признаков: {features.shape[1]}")
+
+    records, records_bytes = traced(lambda: features.to_dict('records'))
+    del records
+    store, store_bytes = traced(lambda: FeatureStore.from_frame(features))
+    # Состояние сервиса сверх хранилища: топ продуктов и их скоры
+    _, service_bytes = traced(lambda: RecommendationService(
+        'config/product_config.json', 'templates/push_templates.json', store))
+
+    rows = [
+        ('dict на клиента (Series.to_dict)', records_bytes),
+        ('DataFrame признаков', features.memory_usage(deep=True).sum()),
+        ('FeatureStore', store_bytes),
+        ('FeatureStore + топ продуктов сервиса', store_bytes + service_bytes),
+    ]
+    for title, total in rows:
+        print(f"{title:<36} {total / n:10.0f} байт/клиент")
+    print(f"Матрица float32: {store.values.shape[1]} колонок, {store.values.nbytes / n:.0f} байт/клиент")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
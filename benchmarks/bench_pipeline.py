@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from synthetic import generate_frames
+from data_processor import DataProcessor
+from product_recommender import ProductRecommender
+from push_generator import PushGenerator
+from pipeline import RecommendationPipeline
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def run_pipeline(pipeline, clients, transactions, transfers):
+    """Время расчёта рекомендаций после загрузки данных"""
+    start = time.perf_counter()
+    features = pipeline.build_features(clients, transactions, transfers)
+    rows = sum(len(chunk) for chunk in pipeline.iter_recommendations(clients, features))
+    elapsed = time.perf_counter() - start
+    assert rows == len(clients)
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Регрессионный бенчмарк: линейность пайплайна по числу клиентов")
+    parser.add_argument('--sizes', default='2000,4000,8000,16000',
+                        help="Размеры популяции через запятую")
+    parser.add_argument('--rows-per-client', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help="Допустимый рост времени на клиента между меньшим и большим размером")
+    args = parser.parse_args(argv)
+
+    pipeline = RecommendationPipeline(
+        DataProcessor(),
+        ProductRecommender(os.path.join(ROOT, 'config', 'product_config.json')),
+        PushGenerator(os.path.join(ROOT, 'templates', 'push_templates.json'))
+    )
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    per_client = {}
+    for size in sizes:
+        clients, transactions, transfers = generate_frames(size, args.rows_per_client)
+        elapsed = min(run_pipeline(pipeline, clients, transactions, transfers) for _ in range(args.repeat))
+        per_client[size] = elapsed / size
+        print(f"{size:>9} клиентов: {elapsed:8.3f} с, {per_client[size] * 1e6:8.1f} мкс/клиент")
+
+    growth = per_client[sizes[-1]] / per_client[sizes[0]]
+    print(f"Рост времени на клиента {sizes[0]} -> {sizes[-1]}: x{growth:.2f}")
+    if growth > args.tolerance:
+        print(f"РЕГРЕССИЯ: рост больше допустимого x{args.tolerance}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from send_history import SendHistory
+
+PRODUCTS = ['Карта для путешествий', 'Премиальная карта', 'Кредитная карта', 'Обмен валют',
+            'Депозит Мультивалютный', 'Инвестиции', 'Кредит наличными']
+
+
+def recommendations(n_clients, rng, changed_share=0.0, previous=None):
+    """Рекомендации для n_clients; доля changed_share получает новый продукт и текст"""
+    if previous is None:
+        products = rng.choice(PRODUCTS, n_clients)
+        texts = np.char.add('Пуш клиенту ', np.arange(n_clients).astype(str)).astype(object)
+        return pd.DataFrame({'client_code': np.arange(1, n_clients + 1), 'product': products,
+                             'push_notification': texts})
+    changed = rng.random(n_clients) < changed_share
+    result = previous.copy()
+    result.loc[changed, 'product'] = rng.choice(PRODUCTS, changed.sum())
+    result.loc[changed, 'push_notification'] = result.loc[changed, 'push_notification'] + ' (новый)'
+    return result
+
+
+def timed_run(history, frame, now, chunk_size):
+    start = time.perf_counter()
+    history.begin_run(now)
+    sent = sum(len(history.filter(frame.iloc[i:i + chunk_size])) for i in range(0, len(frame), chunk_size))
+    history.commit_run()
+    return time.perf_counter() - start, sent
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк пакетной проверки истории отправок")
+    parser.add_argument('--clients', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help="Размер блока, как chunk_size у RecommendationPipeline")
+    parser.add_argument('--changed-share', type=float, default=0.1,
+                        help="Доля клиентов с изменившимся пушем во втором прогоне")
+    parser.add_argument('--target', type=float, default=5.0, help="Допустимое время прогона, секунд")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(42)
+    first = recommendations(args.clients, rng)
+    second = recommendations(args.clients, rng, args.changed_share, first)
+    now = datetime(2025, 9, 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = SendHistory(os.path.join(tmp, 'history'), max_per_client=4, window_days=30, cooldown_days=7)
+        runs = [('первый прогон, пустая история', first, now),
+                ('повтор без изменений', first, now + timedelta(days=1)),
+                (f'изменилось {args.changed_share:.0%}', second, now + timedelta(days=10))]
+        slowest = 0.0
+        for title, frame, when in runs:
+            elapsed, sent = timed_run(history, frame, when, args.chunk_size)
+            slowest = max(slowest, elapsed)
+            print(f"{title:<32} {elapsed:6.2f} с, к отправке {sent}")
+        size = sum(os.path.getsize(os.path.join(folder, name))
+                   for folder, _, names in os.walk(history.path) for name in names)
+        print(f"Размер истории: {size / 2 ** 20:.0f} МБ")
+
+    if slowest > args.target:
+        print(f"ОШИБКА: проверка {args.clients} клиентов дольше {args.target:.1f} с")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+CLI = os.path.join(ROOT, 'src', 'cli.py')
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow')
+
+
+def parse_importtime(stderr):
+    """Импорты верхнего уровня из вывода -X importtime: {модуль: накопленное время, мкс}"""
+    top_level, loaded = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        loaded.add(name.strip().split('.')[0])
+        # Вложенные импорты выделены дополнительными отступами
+        if not name[1:].startswith(' '):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, loaded
+
+
+def measure(command, repeat):
+    """Лучшее из repeat время запуска команды и её импорты"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', CLI] + command, cwd=ROOT,
+                                capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(f"{' '.join(command)}: код {result.returncode}\n{result.stderr[-2000:]}")
+        top_level, loaded = parse_importtime(result.stderr)
+        if best is None or wall < best['wall_ms'] / 1000:
+            best = {
+                'wall_ms': round(wall * 1000, 1),
+                'import_ms': round(sum(top_level.values()) / 1000, 1),
+                'heavy': sorted(name for name in HEAVY_MODULES if name in loaded),
+                'slowest': sorted(top_level.items(), key=lambda item: -item[1])[:5]
+            }
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время старта CLI и импорты по командам (-X importtime)")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--client-code', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--history', default=os.path.join(RESULTS_DIR, 'startup.jsonl'),
+                        help="Файл истории запусков, по строке JSON на запуск")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        commands = {
+            'help': (['--help'], False),
+            'analyze-data': (['analyze-data', args.data_dir, '--rows', '0'], False),
+            'recommend-one': (['recommend-one', str(args.client_code), '--json'], True),
+            'run': (['run', '--limit', '1', '--data-dir', args.data_dir,
+                     '--output', os.path.join(tmp, 'recommendations.csv')], True),
+        }
+        results, status = {}, 0
+        for name, (command, heavy_allowed) in commands.items():
+            result = results[name] = measure(command, args.repeat)
+            print(f"{name:<14} {result['wall_ms']:8.1f} мс, импорты {result['import_ms']:8.1f} мс"
+                  f"  {', '.join(result['heavy']) or '-'}")
+            for module, us in result['slowest']:
+                print(f"{'':16}{module:<24} {us / 1000:8.1f} мс")
+            if result['heavy'] and not heavy_allowed:
+                print(f"ОШИБКА: {name} импортирует {', '.join(result['heavy'])}")
+                status = 1
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'timestamp': datetime.now().isoformat(timespec='seconds'),
+                            'python': sys.version.split()[0], 'commands': results}, ensure_ascii=False) + '\n')
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
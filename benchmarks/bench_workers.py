@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import tempfile
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pandas as pd
+from synthetic import write_dataset
+import main as pipeline_main
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def run(data_dir, output, workers):
+    """Время полного прогона main.py с заданным числом процессов"""
+    argv = ['--data-dir', data_dir, '--no-cache', '--output', output, '--workers', str(workers)]
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        pipeline_main.main(argv)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк ускорения пайплайна по числу процессов")
+    parser.add_argument('--clients', type=int, default=4000)
+    parser.add_argument('--rows-per-client', type=int, default=100)
+    parser.add_argument('--workers', default=None,
+                        help="Числа процессов через запятую (по умолчанию 1, 2, 4 ... до числа ядер)")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        worker_counts = [int(count) for count in args.workers.split(',')]
+    else:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= (os.cpu_count() or 1):
+            worker_counts.append(worker_counts[-1] * 2)
+
+    # main.py читает конфиг и шаблоны относительно корня репозитория
+    os.chdir(ROOT)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, 'data')
+        print(f"Генерация данных: {args.clients} клиентов...")
+        write_dataset(data_dir, args.clients, args.rows_per_client)
+
+        baseline = None
+        reference = None
+        for workers in worker_counts:
+            output = os.path.join(tmp, f'recommendations_{workers}.csv')
+            elapsed = run(data_dir, output, workers)
+            baseline = baseline or elapsed
+            print(f"{workers:>3} процессов: {elapsed:8.2f} с, ускорение x{baseline / elapsed:.2f}, "
+                  f"эффективность {baseline / elapsed / workers:.0%}")
+
+            # Результат не должен зависеть от числа процессов
+            products = pd.read_csv(output)[['client_code', 'product']]
+            if reference is None:
+                reference = products
+            elif not products.equals(reference):
+                print("ОШИБКА: результат отличается от однопроцессного прогона")
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
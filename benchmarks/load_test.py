@@ -0,0 +1,111 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import tempfile
+import argparse
+import subprocess
+
+import numpy as np
+from synthetic import write_dataset
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+async def read_response(reader):
+    """Статус и тело ответа HTTP/1.1 с Content-Length"""
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    body = await reader.readexactly(length)
+    return int(status_line.split()[1]), body
+
+
+async def worker(host, port, codes, deadline, batch_size, latencies, errors):
+    """Одно keep-alive соединение: запросы подряд до дедлайна"""
+    reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random(len(latencies))
+    try:
+        while time.perf_counter() < deadline:
+            if batch_size > 1:
+                body = json.dumps({'client_codes': rng.sample(codes, batch_size)}).encode()
+                request = (f"POST /recommend HTTP/1.1\r\nHost: {host}\r\n"
+                           f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+            else:
+                request = f"GET /recommend/{rng.choice(codes)} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode()
+            start = time.perf_counter()
+            writer.write(request)
+            status, _ = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, codes, duration, concurrency, batch_size):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(worker(host, port, codes, deadline, batch_size, latencies, errors)
+                           for _ in range(concurrency)))
+    return np.array(latencies), errors
+
+
+def start_service(data_dir):
+    """Запуск сервиса отдельным процессом; возвращает процесс и порт"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join('src', 'service.py'), '--data-dir', data_dir, '--port', '0'],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True
+    )
+    for line in process.stdout:
+        match = re.search(r'http://([\d.]+):(\d+)', line)
+        if match:
+            return process, match.group(1), int(match.group(2))
+    raise RuntimeError("Сервис не запустился")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервиса рекомендаций")
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--rows-per-client', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0, help="Длительность, секунды")
+    parser.add_argument('--concurrency', type=int, default=8, help="Число соединений")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Клиентов в запросе; больше 1 - пакетный POST /recommend")
+    parser.add_argument('--p99-ms', type=float, default=5.0, help="Допустимый p99, мс")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, 'data')
+        print(f"Генерация данных: {args.clients} клиентов...")
+        clients = write_dataset(data_dir, args.clients, args.rows_per_client)
+        codes = clients['client_code'].tolist()
+
+        process, host, port = start_service(data_dir)
+        try:
+            latencies, errors = asyncio.run(
+                run_load(host, port, codes, args.duration, args.concurrency, args.batch_size))
+        finally:
+            process.terminate()
+            process.wait()
+
+    p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+    print(f"Запросов: {len(latencies)}, {len(latencies) / args.duration:.0f} в секунду, ошибок: {len(errors)}")
+    print(f"Задержка, мс: p50 {p50:.2f}, p95 {p95:.2f}, p99 {p99:.2f}")
+    if errors or p99 > args.p99_ms:
+        print(f"ОШИБКА: p99 выше {args.p99_ms} мс или есть ошибки")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import pickle
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+
+import numpy as np
+from synthetic import write_dataset
+from data_loader import DataLoader, TRANSACTIONS, TRANSFERS
+from data_processor import DataProcessor
+from product_recommender import ProductRecommender
+from push_generator import PushGenerator
+from pipeline import DEFAULT_PRODUCT
+import main as pipeline_main
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+STAGES = ['ingestion', 'preprocess', 'scoring', 'rendering']
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса.
+
+    В Linux - VmHWM из /proc: ru_maxrss переживает exec и в дочернем
+    процессе показал бы пик родителя. В macOS ru_maxrss - в байтах.
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _save(work_dir, name, value):
+    with open(os.path.join(work_dir, name + '.pickle'), 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load(work_dir, name):
+    with open(os.path.join(work_dir, name + '.pickle'), 'rb') as f:
+        return pickle.load(f)
+
+
+def run_stage(name, data_dir, work_dir):
+    """Одна стадия в текущем процессе: входы берутся из work_dir, результат пишется туда же.
+
+    Запись и чтение промежуточных файлов в замер не входят; пиковый RSS -
+    весь процесс, то есть входы стадии плюс её собственные выделения.
+    """
+    clients = pipeline_main.load_clients(data_dir)
+    n = len(clients)
+    if name == 'ingestion':
+        loader = DataLoader()
+        files = loader.scan(data_dir)
+        action = lambda: loader.load_files(files)
+    elif name == 'preprocess':
+        data = _load(work_dir, 'ingestion')
+        action = lambda: DataProcessor().preprocess_data(clients, data[TRANSACTIONS], data[TRANSFERS])
+    elif name == 'scoring':
+        features = _load(work_dir, 'preprocess')
+        recommender = ProductRecommender(os.path.join(ROOT, 'config', 'product_config.json'))
+
+        def action():
+            names = np.array(recommender.product_names + [DEFAULT_PRODUCT], dtype=object)
+            top = recommender.top_products_batch(recommender.score_batch(features), 1)[:, 0]
+            return names[top]
+    else:
+        features, products = _load(work_dir, 'preprocess'), _load(work_dir, 'scoring')
+        push_generator = PushGenerator(os.path.join(ROOT, 'templates', 'push_templates.json'))
+        action = lambda: push_generator.generate_batch(products, features, clients)
+
+    start = time.perf_counter()
+    value = action()
+    elapsed = time.perf_counter() - start
+    result = {'seconds': round(elapsed, 4), 'items': n, 'peak_rss_mb': round(peak_rss_mb(), 1)}
+    if name == 'ingestion':
+        # Пропускная способность чтения - в строках, а не в файлах
+        result.update(files=len(files), items=len(value[TRANSACTIONS]) + len(value[TRANSFERS]))
+    result['per_second'] = round(result['items'] / elapsed, 1) if elapsed > 0 else None
+    if name != 'rendering':
+        _save(work_dir, name, value)
+    return result
+
+
+def run_stages(data_dir):
+    """Время и пиковая память каждой стадии пайплайна.
+
+    Каждая стадия идёт в отдельном процессе: ru_maxrss - максимум за всю
+    жизнь процесса, и в общем процессе каждая следующая стадия показывала
+    бы пик предыдущих.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in STAGES:
+            completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--stage', name,
+                                        '--data-dir', data_dir, '--work-dir', work_dir],
+                                       capture_output=True, text=True)
+            if completed.returncode != 0:
+                raise RuntimeError(f"Стадия {name}: код {completed.returncode}\n{completed.stderr[-2000:]}")
+            # Последняя строка вывода - результат стадии, выше - сообщения пайплайна
+            results[name] = json.loads(completed.stdout.strip().splitlines()[-1])
+    return results
+
+
+def compare(entry, baseline, tolerance):
+    """Стадии, которые медленнее базовой линии больше чем на tolerance, и рост пиковой памяти"""
+    regressions = []
+    for name in STAGES:
+        current, base = entry['stages'].get(name), baseline['stages'].get(name)
+        if not current or not base or not base['seconds']:
+            continue
+        ratio = current['seconds'] / base['seconds']
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: {base['seconds']:.3f} с -> {current['seconds']:.3f} с (x{ratio:.2f})")
+    if entry['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        regressions.append(f"peak RSS: {baseline['peak_rss_mb']:.0f} МБ -> {entry['peak_rss_mb']:.0f} МБ")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк стадий пайплайна на синтетических данных")
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--rows-per-client', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir',
+                        help="Готовая папка данных (например, от synthetic.py); по умолчанию генерируется временная")
+    parser.add_argument('--history', default=os.path.join(RESULTS_DIR, 'history.jsonl'),
+                        help="Файл истории запусков, по строке JSON на запуск")
+    parser.add_argument('--baseline', default=os.path.join(RESULTS_DIR, 'baseline.json'),
+                        help="Базовая линия для поиска регрессий")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Сохранить этот запуск как новую базовую линию")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Допустимое замедление стадии относительно базовой линии (0.2 = 20%%)")
+    # Служебный режим: одна стадия в дочернем процессе run_stages
+    parser.add_argument('--stage', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.stage:
+        print(json.dumps(run_stage(args.stage, args.data_dir, args.work_dir)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir
+        if data_dir is None:
+            data_dir = os.path.join(tmp, 'data')
+            print(f"Генерация данных: {args.clients} клиентов по {args.rows_per_client} строк...")
+            write_dataset(data_dir, args.clients, args.rows_per_client, args.seed)
+        stages = run_stages(data_dir)
+
+    entry = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'data_dir': args.data_dir,
+        'clients': stages['preprocess']['items'],
+        'rows_per_client': None if args.data_dir else args.rows_per_client,
+        'stages': stages,
+        'peak_rss_mb': max(stage['peak_rss_mb'] for stage in stages.values())
+    }
+    for name in STAGES:
+        stage = stages[name]
+        print(f"{name:<11} {stage['seconds']:8.3f} с  {stage['per_second']:>12,.0f} /с  пик RSS {stage['peak_rss_mb']:.0f} МБ")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    status = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        # Сравнивать имеет смысл только запуски на данных того же размера
+        if (baseline['clients'], baseline['rows_per_client']) != (entry['clients'], entry['rows_per_client']):
+            print("Базовая линия снята на данных другого размера, сравнение пропущено")
+        else:
+            regressions = compare(entry, baseline, args.tolerance)
+            for regression in regressions:
+                print(f"РЕГРЕССИЯ {regression}")
+            status = 1 if regressions else 0
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        print(f"Базовая линия сохранена в {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
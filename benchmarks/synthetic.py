@@ -0,0 +1,215 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+NAMES = ['Айгерим', 'Данияр', 'Сабина', 'Тимур', 'Камилла', 'Аян', 'Руслан', 'Мадина', 'Арман', 'Карина']
+# Статус клиента: доля, медиана среднего остатка, сокращение в файлах операций
+STATUSES = {
+    'Зарплатный клиент': (0.47, 150000, 'зп'),
+    'Премиальный клиент': (0.27, 1500000, 'вип'),
+    'Стандартный клиент': (0.21, 100000, 'обычный'),
+    'Студент': (0.05, 60000, 'студент'),
+}
+CITIES = {
+    'Алматы': 18, 'Астана': 10, 'Караганда': 7, 'Шымкент': 6, 'Павлодар': 6,
+    'Усть-Каменогорск': 4, 'Кызылорда': 4, 'Тараз': 3, 'Костанай': 2, 'Актобе': 2
+}
+PRODUCT = 'Карта для путешествий'
+
+# Категории трат: относительная частота и медианная сумма, по образцу data/
+CATEGORIES = {
+    'Кафе и рестораны': (3781, 6800), 'Продукты питания': (3046, 13800), 'Такси': (2955, 4900),
+    'Едим дома': (1967, 5000), 'Смотрим дома': (1906, 4800), 'Играем дома': (1845, 4900),
+    'Кино': (1677, 4900), 'АЗС': (437, 18700), 'Косметика и Парфюмерия': (136, 27000),
+    'Отели': (58, 50700), 'Путешествия': (35, 61900), 'Спорт': (34, 17600), 'Подарки': (31, 16200),
+    'Развлечения': (25, 8100), 'Ремонт дома': (23, 48300), 'Мебель': (20, 43800),
+    'Одежда и обувь': (19, 42200), 'Медицина': (20, 15000), 'Питомцы': (15, 12000),
+    'Книги': (10, 6000), 'Цветы': (10, 10000), 'Спа и массаж': (10, 25000),
+    'Ювелирные украшения': (3, 421700), 'Авто': (2, 114200),
+}
+# Типы переводов: относительная частота и медианная сумма
+TRANSFER_TYPES = {
+    'card_out': (8829, 17800), 'p2p_out': (3600, 18200), 'atm_withdrawal': (1152, 35100),
+    'card_in': (981, 12500), 'utilities_out': (918, 29600), 'loan_payment_out': (612, 60100),
+    'cashback_in': (540, 12200), 'refund_in': (360, 11900), 'fx_buy': (216, 184000),
+    'salary_in': (171, 440900), 'invest_out': (144, 125700), 'installment_payment_out': (108, 43700),
+    'cc_repayment_out': (108, 90500), 'deposit_topup_out': (108, 70300), 'fx_sell': (54, 181200),
+    'invest_in': (36, 92100), 'gold_buy_out': (18, 1259600), 'gold_sell_in': (18, 1399900),
+    'family_in': (18, 24300), 'stipend_in': (9, 37500), 'deposit_fx_topup_out': (9, 300000),
+    'deposit_fx_withdraw_in': (5, 250000),
+}
+INCOMING_TYPES = {name for name in TRANSFER_TYPES if name.endswith('_in')} | {'fx_sell'}
+
+# Иностранная валюта встречается у путешествующих клиентов в поездочных категориях
+TRAVEL_CATEGORIES = ['Кафе и рестораны', 'Такси', 'Отели', 'Путешествия']
+TRAVELLER_SHARE = 0.1
+FOREIGN_SHARE = 0.3
+FOREIGN_CURRENCIES = {'USD': 0.5, 'EUR': 0.35, 'RUB': 0.15}
+BASE_CURRENCY = 'KZT'
+
+# Насколько предпочтения клиента отличаются от общих частот (меньше - сильнее)
+PREFERENCE_CONCENTRATION = 20.0
+AMOUNT_SIGMA = 0.8
+PERIOD_START = np.datetime64('2025-06-01T00:00:00')
+PERIOD_SECONDS = 92 * 24 * 3600
+CHUNK_CLIENTS = 5000
+
+
+def _probabilities(weights):
+    weights = np.asarray(list(weights), dtype=np.float64)
+    return weights / weights.sum()
+
+
+def _choose_per_client(rng, client_rows, global_weights):
+    """Ключи строк по личным распределениям клиентов (Дирихле вокруг общих частот)"""
+    n_clients = client_rows.max() + 1 if len(client_rows) else 0
+    preferences = rng.dirichlet(PREFERENCE_CONCENTRATION * global_weights, n_clients)
+    cumulative = np.cumsum(preferences, axis=1)
+    cumulative[:, -1] = 1.0
+    # Один searchsorted на всех: у клиента i границы сдвинуты на i
+    offsets = (cumulative + np.arange(n_clients)[:, None]).ravel()
+    draws = rng.random(len(client_rows)) + client_rows
+    keys = np.searchsorted(offsets, draws, side='right') - client_rows * len(global_weights)
+    return np.minimum(keys, len(global_weights) - 1)
+
+
+def generate_frames(n_clients, rows_per_client=300, seed=42, start_code=1):
+    """Синтетические клиенты, транзакции и переводы в форме DataLoader.load"""
+    rng = np.random.default_rng(seed)
+    codes = np.arange(start_code, start_code + n_clients)
+
+    status_names = list(STATUSES)
+    status_index = rng.choice(len(status_names), n_clients, p=_probabilities(v[0] for v in STATUSES.values()))
+    balance_median = np.array([STATUSES[name][1] for name in status_names])[status_index]
+    clients = pd.DataFrame({
+        'client_code': codes,
+        'name': rng.choice(NAMES, n_clients),
+        'status': np.array(status_names, dtype=object)[status_index],
+        'age': rng.integers(18, 70, n_clients),
+        'city': rng.choice(list(CITIES), n_clients, p=_probabilities(CITIES.values())),
+        'avg_monthly_balance_KZT': np.round(balance_median * rng.lognormal(0, 0.9, n_clients)).astype(np.int64)
+    })
+    short_status = np.array([STATUSES[name][2] for name in status_names], dtype=object)[status_index]
+    travellers = rng.random(n_clients) < TRAVELLER_SHARE
+
+    n_rows = n_clients * rows_per_client
+    client_rows = np.repeat(np.arange(n_clients), rows_per_client)
+
+    def operations(kind_names, profile):
+        """Строки одного вида операций: ключ, сумма и общие колонки"""
+        keys = _choose_per_client(rng, client_rows, _probabilities(v[0] for v in profile.values()))
+        medians = np.array([v[1] for v in profile.values()], dtype=np.float64)
+        amount = np.round(medians[keys] * rng.lognormal(0, AMOUNT_SIGMA, n_rows), 2)
+        seconds = np.sort(rng.integers(0, PERIOD_SECONDS, n_rows).reshape(n_clients, rows_per_client), axis=1)
+        frame = pd.DataFrame({
+            'client_code': codes[client_rows],
+            'name': clients['name'].to_numpy()[client_rows],
+            'product': PRODUCT,
+            'status': short_status[client_rows],
+            'city': clients['city'].to_numpy()[client_rows],
+            'date': PERIOD_START + seconds.ravel().astype('timedelta64[s]'),
+        })
+        return frame, np.array(kind_names, dtype=object)[keys], amount.astype(np.float32)
+
+    transactions, categories, amount = operations(list(CATEGORIES), CATEGORIES)
+    foreign = (np.isin(categories, TRAVEL_CATEGORIES) & travellers[client_rows]
+               & (rng.random(n_rows) < FOREIGN_SHARE))
+    currency = np.full(n_rows, BASE_CURRENCY, dtype=object)
+    currency[foreign] = rng.choice(list(FOREIGN_CURRENCIES), foreign.sum(), p=_probabilities(FOREIGN_CURRENCIES.values()))
+    transactions['category'] = pd.Categorical(categories)
+    transactions['amount'] = amount
+    transactions['currency'] = pd.Categorical(currency)
+
+    transfers, types, amount = operations(list(TRANSFER_TYPES), TRANSFER_TYPES)
+    transfers['type'] = pd.Categorical(types)
+    transfers['direction'] = pd.Categorical(np.where(np.isin(types, list(INCOMING_TYPES)), 'in', 'out'))
+    transfers['amount'] = amount
+    transfers['currency'] = pd.Categorical(np.full(n_rows, BASE_CURRENCY, dtype=object))
+    return clients, transactions, transfers
+
+
+# Дробная часть суммы: 0..99 копеек -> '.00'..'.99'
+_CENTS = np.array([f'.{cents:02d}' for cents in range(100)], dtype=object)
+
+
+def _csv_lines(frame):
+    """Строки CSV блока склейкой колонок object-массивов, без построчного форматирования"""
+    columns = []
+    for name in frame.columns:
+        values = frame[name].to_numpy()
+        if name == 'date':
+            text = np.datetime_as_string(values.astype('datetime64[s]'), unit='s')
+            chars = text.view('<U1').reshape(len(text), -1).copy()
+            chars[:, 10] = ' '
+            text = chars.view(text.dtype).ravel()
+        elif name == 'amount':
+            cents = np.round(values.astype(np.float64) * 100).astype(np.int64)
+            text = (cents // 100).astype(str).astype(object) + _CENTS[cents % 100]
+        else:
+            text = np.asarray(values).astype(str)
+        columns.append(text.astype(object))
+
+    lines = columns[0]
+    for text in columns[1:]:
+        lines = lines + ',' + text
+    return lines + '\n'
+
+
+def _write_client_files(folder, kind, frame, rows_per_client):
+    """Файлы client_N_<kind>_3m.csv: строки блока делятся по клиентам"""
+    header = ','.join(frame.columns) + '\n'
+    lines = _csv_lines(frame)
+    codes = frame['client_code'].to_numpy()[::rows_per_client]
+    for i, client_code in enumerate(codes.tolist()):
+        path = os.path.join(folder, f'client_{client_code}_{kind}_3m.csv')
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            f.write(header)
+            f.write(''.join(lines[i * rows_per_client:(i + 1) * rows_per_client]))
+
+
+def write_dataset(folder, n_clients, rows_per_client=300, seed=42, chunk_clients=CHUNK_CLIENTS, progress=False):
+    """Запись синтетических данных в раскладке data/: clients.csv и файлы по клиентам.
+
+    Клиенты генерируются блоками по chunk_clients со своим зерном у каждого
+    блока, поэтому результат детерминирован при тех же seed и chunk_clients,
+    а память не зависит от общего числа клиентов.
+    """
+    os.makedirs(folder, exist_ok=True)
+    clients_path = os.path.join(folder, 'clients.csv')
+    blocks = []
+    for index, start in enumerate(range(0, n_clients, chunk_clients)):
+        size = min(chunk_clients, n_clients - start)
+        clients, transactions, transfers = generate_frames(
+            size, rows_per_client, seed=[seed, index], start_code=start + 1)
+        clients.to_csv(clients_path, mode='w' if index == 0 else 'a', header=index == 0, index=False,
+                       encoding='utf-8-sig' if index == 0 else 'utf-8')
+        if rows_per_client:
+            _write_client_files(folder, 'transactions', transactions, rows_per_client)
+            _write_client_files(folder, 'transfers', transfers, rows_per_client)
+        blocks.append(clients)
+        if progress:
+            print(f"Записано клиентов: {start + size}/{n_clients}", flush=True)
+    return pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генератор синтетических данных в раскладке data/")
+    parser.add_argument('folder', help="Папка для clients.csv и файлов клиентов")
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--rows-per-client', type=int, default=300,
+                        help="Строк в каждом файле транзакций и переводов")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-clients', type=int, default=CHUNK_CLIENTS,
+                        help="Клиентов в блоке генерации; влияет на память и на сами данные")
+    args = parser.parse_args(argv)
+
+    write_dataset(args.folder, args.clients, args.rows_per_client, args.seed, args.chunk_clients, progress=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import os
+import sys
+import argparse
+import contextlib
+
+# Тяжёлые модули (pandas, numpy, pyarrow) импортируются внутри команд, которым они
+# нужны: analyze-data и --help запускаются без них
+
+# Тот же снимок, что у main.py с --cache-dir по умолчанию
+SNAPSHOT_PATH = os.path.join('cache', 'config_snapshot.pickle')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Персональные пуш-уведомления: прогон, анализ данных, один клиент")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+
+    commands.add_parser('run', add_help=False,
+                        help="Пакетный прогон по всем клиентам; параметры как у main.py (см. run --help)")
+
+    analyze = commands.add_parser('analyze-data', help="Структура файлов в папке данных")
+    analyze.add_argument('data_dir', nargs='?', default='data')
+    analyze.add_argument('--rows', type=int, default=2, help="Сколько первых строк показать по каждому файлу")
+    analyze.set_defaults(handler=analyze_data)
+
+    one = commands.add_parser('recommend-one', help="Рекомендация и пуш для одного клиента")
+    one.add_argument('client_code', type=int)
+    one.add_argument('--data-dir', default='data')
+    one.add_argument('--config', default='config/product_config.json')
+    one.add_argument('--templates', default='templates/push_templates.json')
+    one.add_argument('--snapshot', default=SNAPSHOT_PATH,
+                     help="Снимок разобранного конфига и шаблонов; пересобирается при их изменении")
+    one.add_argument('--no-snapshot', action='store_true', help="Разбирать конфиг и шаблоны заново")
+    one.add_argument('--top-products', type=int, default=4, metavar='N', help="Сколько продуктов показать в топе")
+    one.add_argument('--json', action='store_true', help="Ответ одной строкой JSON, как у service.py")
+    one.set_defaults(handler=recommend_one)
+    return parser
+
+
+def analyze_data(args):
+    from file_analyzer import analyze_data_folder
+
+    analyze_data_folder(args.data_dir, args.rows)
+    return 0
+
+
+def read_client(data_folder, client_code):
+    """Строка клиента из таблицы клиентов без разбора всего файла; None - клиента нет"""
+    import io
+    import pandas as pd
+    from data_loader import find_clients_file
+
+    with open(find_clients_file(data_folder), 'r', encoding='utf-8-sig') as f:
+        header = f.readline()
+        if header.split(',')[0].strip() != 'client_code':
+            f.seek(0)
+            clients = pd.read_csv(f)
+            clients = clients[clients['client_code'] == client_code]
+            return clients.reset_index(drop=True) if len(clients) else None
+        prefix = f'{client_code},'
+        for line in f:
+            if line.startswith(prefix):
+                return pd.read_csv(io.StringIO(header + line))
+    return None
+
+
+def recommend_one(args):
+    import json
+    from data_loader import DataLoader, TRANSACTIONS, TRANSFERS
+    from data_processor import DataProcessor
+    from config_snapshot import load_components
+    from pipeline import RecommendationPipeline
+
+    client = read_client(args.data_dir, args.client_code)
+    if client is None:
+        print(f"Клиент {args.client_code} не найден", file=sys.stderr)
+        return 1
+
+    # В режиме --json в stdout идёт только ответ, сообщения обработки - в stderr
+    with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+        loader = DataLoader(workers=2)
+        data = loader.load_files(loader.scan(args.data_dir, [args.client_code]))
+        recommender, push_generator = load_components(args.config, args.templates,
+                                                      None if args.no_snapshot else args.snapshot)
+        pipeline = RecommendationPipeline(DataProcessor(), recommender, push_generator, top_n=args.top_products)
+        row = pipeline.recommend(client, data[TRANSACTIONS], data[TRANSFERS]).iloc[0]
+
+    top_products = [
+        {'product': row[f'top_product_{k}'], 'score': float(row[f'top_score_{k}'])}
+        for k in range(1, args.top_products + 1) if row[f'top_product_{k}'] is not None
+    ]
+    if args.json:
+        print(json.dumps({
+            'client_code': args.client_code,
+            'product': row['product'],
+            'push_notification': row['push_notification'],
+            'top_products': top_products
+        }, ensure_ascii=False))
+        return 0
+
+    print(f"Клиент {args.client_code}:")
+    print(f"Продукт: {row['product']}")
+    print(f"Пуш: {row['push_notification']}")
+    if top_products:
+        print("Топ продуктов:")
+        for item in top_products:
+            print(f"  {item['product']}: {item['score']:.2f}")
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # run целиком передаёт параметры main.py, чтобы не дублировать их здесь
+    if argv and argv[0] == 'run':
+        from main import main as run_main
+        return run_main(argv[1:]) or 0
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import os
+import sys
+import pickle
+import hashlib
+from product_recommender import ProductRecommender
+from push_generator import PushGenerator
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_NAME = 'config_snapshot.pickle'
+
+
+# Модули, чьи объекты или байткод лежат в снимке: их правка делает снимок устаревшим
+CODE_MODULES = ('scoring_rules.py', 'product_recommender.py', 'push_generator.py', 'config_snapshot.py')
+
+
+def _code_hash():
+    """Хэш исходников CODE_MODULES"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha1()
+    for name in CODE_MODULES:
+        with open(os.path.join(directory, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _sources_key(paths):
+    """Версия снимка: формат, версия Python (байткод правил), исходники кода и mtime/размер файлов конфига"""
+    key = [SNAPSHOT_VERSION, sys.version, _code_hash()]
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            key.append((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            key.append((os.path.abspath(path), None, None))
+    return key
+
+
+def load_components(config_path, templates_path, snapshot_path=None):
+    """ProductRecommender и PushGenerator; со snapshot_path - из готового снимка.
+
+    В снимке лежат разобранный конфиг, скомпилированные правила (байткодом)
+    и разобранные шаблоны. Он пересобирается, когда меняется конфиг,
+    шаблоны, код из CODE_MODULES или версия Python; ошибка записи снимка
+    прогон не прерывает.
+    """
+    if snapshot_path is None:
+        return ProductRecommender(config_path), PushGenerator(templates_path)
+
+    key = _sources_key([config_path, templates_path])
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot['key'] == key:
+            return snapshot['recommender'], snapshot['push_generator']
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Снимок конфига не прочитан, пересборка: {e}")
+
+    recommender, push_generator = ProductRecommender(config_path), PushGenerator(templates_path)
+    try:
+        directory = os.path.dirname(snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'key': key, 'recommender': recommender, 'push_generator': push_generator}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+    except OSError as e:
+        print(f"Снимок конфига не сохранён: {e}")
+    return recommender, push_generator
@@ -0,0 +1,56 @@
+import os
+import argparse
+from data_loader import DataLoader, detect_file_kind, TRANSACTIONS, TRANSFERS
+from data_processor import DataProcessor
+from feature_state import FeatureState, DEFAULT_WINDOW_DAYS
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ежедневное обновление состояния признаков новыми данными")
+    parser.add_argument('paths', nargs='+',
+                        help="Новые файлы транзакций и переводов или папки с ними")
+    parser.add_argument('--state', default='cache/feature_state.pkl',
+                        help="Файл состояния агрегатов")
+    parser.add_argument('--window-days', type=int,
+                        help=f"Окно признаков в днях; по умолчанию - из состояния, для нового - {DEFAULT_WINDOW_DAYS}")
+    return parser.parse_args(argv)
+
+def collect_files(loader, paths):
+    """Файлы данных из списка путей: папки сканируются, файлы определяются по имени и заголовку"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(loader.scan(path))
+            continue
+        kind, client_code = detect_file_kind(path)
+        if kind is None:
+            print(f"Пропущен файл неизвестного типа: {path}")
+            continue
+        files.append((path, kind, client_code))
+    return files
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    engine = DataProcessor().feature_engine
+    if os.path.exists(args.state):
+        state = FeatureState.load(args.state, engine, args.window_days)
+    else:
+        state = FeatureState(engine, args.window_days or DEFAULT_WINDOW_DAYS)
+        print(f"Новое состояние признаков, окно {state.window_days} дн.")
+    print(f"Состояние на {state.as_of}: {len(state.totals.client_codes)} клиентов, {len(state.days)} дней")
+    
+    loader = DataLoader()
+    files = state.new_sources(collect_files(loader, args.paths))
+    if not files:
+        print("Новых файлов нет, состояние не изменилось")
+        return
+    data = loader.load_files(files)
+    print(f"Новых транзакций: {len(data[TRANSACTIONS])}, переводов: {len(data[TRANSFERS])}")
+    
+    state.add_rows(data[TRANSACTIONS], data[TRANSFERS])
+    state.add_sources(files)
+    state.save(args.state)
+    print(f"Состояние обновлено на {state.as_of}: {len(state.totals.client_codes)} клиентов, {len(state.days)} дней")
+
+if __name__ == "__main__":
+    main()
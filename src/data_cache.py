@@ -0,0 +1,187 @@
+import os
+import json
+import shutil
+import pandas as pd
+from data_loader import DataLoader, CATEGORICAL_COLUMNS, TRANSACTIONS, TRANSFERS, filter_files
+from metrics import metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+MANIFEST_VERSION = 1
+
+
+def is_available():
+    """Кэш требует pyarrow"""
+    return pa is not None
+
+
+class DataCache:
+    """Колоночный кэш нормализованных транзакций и переводов.
+
+    Данные хранятся в Parquet с разбиением по client_code и месяцу:
+    <cache_dir>/<kind>/client_code=<N>/month=<YYYY-MM>/<исходный файл>.parquet.
+    Манифест хранит для каждого исходного файла mtime, размер и список
+    его разделов, поэтому повторно разбираются только изменившиеся файлы.
+    """
+
+    def __init__(self, cache_dir='cache', loader=None):
+        if not is_available():
+            raise ImportError("Для кэша данных нужен pyarrow")
+        self.cache_dir = cache_dir
+        self.loader = loader or DataLoader()
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        """Чтение манифеста; несовместимая версия сбрасывает кэш"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {'version': MANIFEST_VERSION, 'files': {}}
+
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {'version': MANIFEST_VERSION, 'files': {}}
+        return manifest
+
+    def _write_manifest(self):
+        """Атомарная запись манифеста"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _source_key(file_path):
+        return os.path.abspath(file_path)
+
+    @staticmethod
+    def _file_signature(file_path):
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _is_fresh(self, file_path, kind):
+        entry = self.manifest['files'].get(self._source_key(file_path))
+        if entry is None or entry['kind'] != kind:
+            return False
+        mtime, size = self._file_signature(file_path)
+        return entry['mtime'] == mtime and entry['size'] == size
+
+    def _drop_entry(self, key):
+        """Удаление разделов исходного файла из кэша"""
+        entry = self.manifest['files'].pop(key, None)
+        if entry is None:
+            return
+        for partition in entry['partitions']:
+            try:
+                os.remove(os.path.join(self.cache_dir, partition))
+            except FileNotFoundError:
+                pass
+
+    def _write_partitions(self, file_path, kind, df):
+        """Запись одного исходного файла в разделы client_code/month"""
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        months = df['date'].dt.strftime('%Y-%m').fillna('unknown')
+        partitions = []
+
+        # Категории пишем строками: словари разных файлов не совпадают,
+        # общий набор категорий строится один раз при чтении
+        df = df.astype({col: 'object' for col in CATEGORICAL_COLUMNS[kind] if col in df.columns})
+
+        for (client_code, month), part in df.groupby([df['client_code'], months], sort=False):
+            rel_dir = os.path.join(kind, f'client_code={client_code}', f'month={month}')
+            os.makedirs(os.path.join(self.cache_dir, rel_dir), exist_ok=True)
+            rel_path = os.path.join(rel_dir, f'{stem}.parquet')
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            pq.write_table(table, os.path.join(self.cache_dir, rel_path))
+            partitions.append(rel_path)
+
+        return partitions
+
+    def update_files(self, files):
+        """Повторный разбор тех файлов из списка, что изменились с прошлого запуска"""
+        stale = [(file_path, kind, client_code) for file_path, kind, client_code in files
+                 if not self._is_fresh(file_path, kind)]
+        if not stale:
+            return
+
+        print(f"Обновление кэша: {len(stale)} файлов из {len(files)}")
+        # Сигнатура снимается до чтения, чтобы изменение во время чтения
+        # привело к повторному разбору при следующем запуске
+        signatures = {file_path: self._file_signature(file_path) for file_path, _, _ in stale}
+        for file_path, _, _ in stale:
+            self._drop_entry(self._source_key(file_path))
+
+        for file_path, kind, df in self.loader.iter_files(stale):
+            mtime, size = signatures[file_path]
+            self.manifest['files'][self._source_key(file_path)] = {
+                'kind': kind,
+                'mtime': mtime,
+                'size': size,
+                'partitions': self._write_partitions(file_path, kind, df)
+            }
+        self._write_manifest()
+
+    def prune(self, all_files):
+        """Удаление из кэша файлов, которых больше нет в папке"""
+        seen = {self._source_key(file_path) for file_path, _, _ in all_files}
+        removed = [key for key in self.manifest['files'] if key not in seen]
+        for key in removed:
+            self._drop_entry(key)
+        if removed:
+            self._write_manifest()
+
+    def refresh(self, data_folder, client_codes=None):
+        """Сверка кэша с папкой: удалённые файлы выбрасываются, изменённые разбираются заново"""
+        all_files = self.loader.scan(data_folder)
+        self.prune(all_files)
+        files = filter_files(all_files, client_codes)
+        self.update_files(files)
+        return files
+
+    def read(self, kind, sources=None):
+        """Чтение закэшированных данных одного типа через memory-map"""
+        files = self.manifest['files']
+        keys = sorted(files) if sources is None else sorted(key for key in sources if key in files)
+        paths = []
+        for key in keys:
+            entry = files[key]
+            if entry['kind'] == kind:
+                paths.extend(os.path.join(self.cache_dir, partition) for partition in entry['partitions'])
+
+        if not paths:
+            return pd.DataFrame()
+
+        with metrics.stage('ingest_cache') as stage:
+            dataset = ds.dataset(paths, format='parquet', filesystem=pafs.LocalFileSystem(use_mmap=True))
+            df = dataset.to_table().to_pandas()
+            for col in CATEGORICAL_COLUMNS[kind]:
+                if col in df.columns:
+                    df[col] = df[col].astype('category')
+            stage.add_rows(len(df))
+        return df
+
+    def load_files(self, files):
+        """Загрузка заданных файлов (из DataLoader.scan) через кэш"""
+        self.update_files(files)
+        sources = {self._source_key(file_path) for file_path, _, _ in files}
+        return {kind: self.read(kind, sources) for kind in (TRANSACTIONS, TRANSFERS)}
+
+    def load(self, data_folder, client_codes=None):
+        """Загрузка данных с обновлением кэша; формат как у DataLoader.load"""
+        self.loader.errors = []
+        files = self.refresh(data_folder, client_codes)
+        sources = {self._source_key(file_path) for file_path, _, _ in files}
+        return {kind: self.read(kind, sources) for kind in (TRANSACTIONS, TRANSFERS)}
+
+    def clear(self):
+        """Полная очистка кэша"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self.manifest = {'version': MANIFEST_VERSION, 'files': {}}
@@ -0,0 +1,174 @@
+import os
+import re
+import glob
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import pandas as pd
+from pandas.api.types import union_categoricals
+from metrics import metrics
+
+# Тип файла определяется по имени: client_N_transactions_3m.csv / client_N_transfers_3m.csv
+FILE_NAME_PATTERN = re.compile(r'^client_(\d+)_(transactions|transfers)(?:_\w+)?\.csv$', re.IGNORECASE)
+
+TRANSACTIONS = 'transactions'
+TRANSFERS = 'transfers'
+
+# Фиксированные типы колонок, чтобы pandas не угадывал их по каждому файлу
+COLUMN_DTYPES = {
+    TRANSACTIONS: {
+        'client_code': 'int64',
+        'category': 'category',
+        'amount': 'float32',
+        'currency': 'category'
+    },
+    TRANSFERS: {
+        'client_code': 'int64',
+        'type': 'category',
+        'direction': 'category',
+        'amount': 'float32',
+        'currency': 'category'
+    }
+}
+
+CATEGORICAL_COLUMNS = {
+    kind: [col for col, dtype in dtypes.items() if dtype == 'category']
+    for kind, dtypes in COLUMN_DTYPES.items()
+}
+
+
+def detect_file_kind(file_path):
+    """Определение типа файла по имени, а при неизвестном имени - по строке заголовка"""
+    file_name = os.path.basename(file_path)
+    match = FILE_NAME_PATTERN.match(file_name)
+    if match:
+        return match.group(2).lower(), int(match.group(1))
+
+    if not file_name.lower().endswith('.csv'):
+        return None, None
+
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        header = f.readline()
+    columns = {col.strip() for col in header.split(',')}
+
+    if 'category' in columns:
+        return TRANSACTIONS, None
+    if 'type' in columns and 'direction' in columns:
+        return TRANSFERS, None
+    return None, None
+
+
+def read_data_file(file_path, kind):
+    """Чтение одного файла с фиксированными типами колонок"""
+    df = pd.read_csv(file_path, encoding='utf-8-sig', dtype=COLUMN_DTYPES[kind])
+    df['date'] = pd.to_datetime(df['date'], format='ISO8601', errors='coerce')
+    return df
+
+
+def _read_task(task):
+    """Задача для пула: возвращает (путь, тип, DataFrame, ошибка)"""
+    file_path, kind = task
+    try:
+        with metrics.stage('ingest_file', log=False) as stage:
+            df = read_data_file(file_path, kind)
+            stage.add_rows(len(df))
+        return file_path, kind, df, None
+    except Exception as e:
+        return file_path, kind, None, str(e)
+
+
+def concat_frames(frames, kind):
+    """Объединение файлов одного типа с общим набором категорий"""
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+
+    categoricals = {}
+    for col in CATEGORICAL_COLUMNS[kind]:
+        parts = [df[col] for df in frames if col in df.columns]
+        if len(parts) == len(frames):
+            categoricals[col] = union_categoricals(parts, sort_categories=True)
+
+    result = pd.concat(frames, ignore_index=True)
+    for col, values in categoricals.items():
+        result[col] = values
+    return result
+
+
+def find_clients_file(data_folder):
+    """Путь к таблице клиентов: clients.csv, иначе первый файл с client в имени"""
+    clients_path = os.path.join(data_folder, 'clients.csv')
+    if os.path.exists(clients_path):
+        return clients_path
+    # Попробуем найти файл с другим регистром
+    client_files = glob.glob(os.path.join(data_folder, '*client*'))
+    if client_files:
+        return client_files[0]
+    raise FileNotFoundError("Файл с клиентами не найден")
+
+
+def filter_files(files, client_codes=None):
+    """Файлы нужных клиентов; файлы без кода в имени читаются всегда"""
+    if client_codes is None:
+        return files
+    client_codes = set(client_codes)
+    return [entry for entry in files if entry[2] is None or entry[2] in client_codes]
+
+
+class DataLoader:
+    def __init__(self, workers=None, executor='thread'):
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.executor = executor
+        self.errors = []
+
+    def scan(self, data_folder, client_codes=None):
+        """Список файлов данных: (путь, тип, client_code); с client_codes - как filter_files"""
+        wanted = set(client_codes) if client_codes is not None else None
+        files = []
+        for file in sorted(os.listdir(data_folder)):
+            if wanted is not None:
+                # Файлы других клиентов отсеиваются по имени, без обращения к диску
+                match = FILE_NAME_PATTERN.match(file)
+                if match and int(match.group(1)) not in wanted:
+                    continue
+            file_path = os.path.join(data_folder, file)
+            if not os.path.isfile(file_path):
+                continue
+            try:
+                kind, client_code = detect_file_kind(file_path)
+            except Exception as e:
+                self.errors.append((file_path, str(e)))
+                print(f"Ошибка при чтении файла {file}: {e}")
+                continue
+            if kind is not None:
+                files.append((file_path, kind, client_code))
+        return files
+
+    def iter_files(self, files):
+        """Параллельное чтение файлов: (путь, тип, DataFrame) по мере готовности"""
+        tasks = [(file_path, kind) for file_path, kind, _ in files]
+        if not tasks:
+            return
+
+        pool_class = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+        with pool_class(max_workers=self.workers) as pool:
+            chunksize = max(1, len(tasks) // (self.workers * 4)) if self.executor == 'process' else 1
+            for file_path, kind, df, error in pool.map(_read_task, tasks, chunksize=chunksize):
+                if error is not None:
+                    self.errors.append((file_path, error))
+                    print(f"Ошибка при чтении файла {os.path.basename(file_path)}: {error}")
+                    continue
+                yield file_path, kind, df
+
+    def load_files(self, files):
+        """Чтение файлов, по одному DataFrame на тип"""
+        frames = {TRANSACTIONS: [], TRANSFERS: []}
+        for _, kind, df in self.iter_files(files):
+            frames[kind].append(df)
+
+        with metrics.stage('concat', rows=sum(len(df) for dfs in frames.values() for df in dfs)):
+            return {kind: concat_frames(dfs, kind) for kind, dfs in frames.items()}
+
+    def load(self, data_folder, client_codes=None):
+        """Загрузка всех транзакций и переводов из папки (или только для client_codes)"""
+        self.errors = []
+        return self.load_files(self.scan(data_folder, client_codes))
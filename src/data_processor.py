@@ -1,7 +1,4 @@
-import pandas as pd
-import numpy as np
-import os
-from datetime import datetime
+from feature_engine import FeatureEngine
 
 class DataProcessor:
     def __init__(self):
@@ -56,76 +53,18 @@ class DataProcessor:
             'gold_buy_out': 'gold',
             'gold_sell_in': 'gold'
         }
+        self.feature_engine = FeatureEngine(self.category_mapping, self.transfer_mapping)
     
-    def preprocess_data(self, clients, transactions, transfers):
-        """Предобработка данных"""
-        features = clients.copy()
-        
-        # Обработка транзакций
+    def build_features(self, clients, transactions, transfers):
+        """Матрица признаков клиентов (FeatureMatrix) за один проход по данным"""
         if not transactions.empty:
             print("Обработка транзакций...")
-            transactions['date'] = pd.to_datetime(transactions['date'], errors='coerce')
-            transactions = transactions.dropna(subset=['date'])
-            transactions['month'] = transactions['date'].dt.month
-            transactions['category_en'] = transactions['category'].map(self.category_mapping)
-            transactions['category_en'] = transactions['category_en'].fillna('other')
-            
-            # Статистика по транзакциям
-            transaction_stats = transactions.groupby('client_code').agg({
-                'amount': ['sum', 'mean', 'count'],
-                'category': lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Unknown'
-            }).reset_index()
-            
-            transaction_stats.columns = ['client_code', 'total_spent', 'avg_transaction', 
-                                       'transaction_count', 'most_common_category']
-            
-            # Траты по категориям
-            category_spending = transactions.pivot_table(
-                index='client_code', 
-                columns='category_en', 
-                values='amount', 
-                aggfunc='sum',
-                fill_value=0
-            ).reset_index()
-            
-            features = features.merge(transaction_stats, on='client_code', how='left')
-            features = features.merge(category_spending, on='client_code', how='left')
-        
-        # Обработка переводов
         if not transfers.empty:
             print("Обработка переводов...")
-            transfers['date'] = pd.to_datetime(transfers['date'], errors='coerce')
-            transfers = transfers.dropna(subset=['date'])
-            transfers['month'] = transfers['date'].dt.month
-            transfers['type_category'] = transfers['type'].map(self.transfer_mapping)
-            transfers['type_category'] = transfers['type_category'].fillna('other')
-            
-            # Статистика по переводам
-            transfer_stats = transfers.groupby('client_code').agg({
-                'amount': ['sum', 'mean'],
-                'direction': lambda x: (x == 'in').sum() / len(x) if len(x) > 0 else 0
-            }).reset_index()
-            
-            transfer_stats.columns = ['client_code', 'total_transfers', 'avg_transfer', 'income_ratio']
-            
-            # Переводы по типам
-            transfer_types = transfers.pivot_table(
-                index='client_code', 
-                columns='type_category', 
-                values='amount', 
-                aggfunc='sum',
-                fill_value=0
-            ).reset_index()
-            
-            features = features.merge(transfer_stats, on='client_code', how='left')
-            features = features.merge(transfer_types, on='client_code', how='left')
-        
-        # Заполнение пропусков
-        numeric_cols = features.select_dtypes(include=[np.number]).columns
-        features[numeric_cols] = features[numeric_cols].fillna(0)
-        
-        categorical_cols = features.select_dtypes(include=['object']).columns
-        features[categorical_cols] = features[categorical_cols].fillna('Unknown')
-        
+        features = self.feature_engine.build(clients, transactions, transfers)
         print("Обработка данных завершена")
-        return features
\ No newline at end of file
+        return features
+    
+    def preprocess_data(self, clients, transactions, transfers):
+        """Предобработка данных"""
+        return self.build_features(clients, transactions, transfers).to_frame()
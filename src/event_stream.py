@@ -0,0 +1,420 @@
+import sys
+import json
+import queue
+import argparse
+import threading
+import socketserver
+from datetime import datetime
+from data_loader import DataLoader, TRANSACTIONS, TRANSFERS
+from data_processor import DataProcessor
+from feature_engine import TOP_CATEGORY_COLUMNS, FX_CURRENCY_COLUMN, BASE_CURRENCY
+from feature_state import FeatureState
+from product_recommender import ProductRecommender
+from push_generator import PushGenerator
+
+PROFILE_COLUMNS = ['name', 'status', 'city']
+MODE_COLUMN = 'most_common_category'
+NO_RULES = frozenset()
+
+
+def _amount(value):
+    """Сумма операции; пустая или нечисловая сумма - None, как NaN в CSV"""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return amount if amount == amount else None
+
+
+def _valid_date(value):
+    """Операции без корректной даты отбрасываются, как в пакетной предобработке"""
+    try:
+        datetime.fromisoformat(value if isinstance(value, str) else str(value))
+    except ValueError:
+        return False
+    return True
+
+
+class ClientState:
+    """Счётчики и признаки одного клиента для обновления по событиям"""
+
+    __slots__ = ('features', 'tx_rows', 'tx_valid', 'mode_rows', 'tr_rows', 'tr_valid', 'tr_in',
+                 'cur_rows', 'fx_rows', 'scores', 'top', 'fired')
+
+    def __init__(self, features):
+        # Признаки в формате строки DataProcessor.preprocess_data
+        self.features = features
+        self.tx_rows = {}
+        self.tx_valid = 0.0
+        self.mode_rows = 0.0
+        self.tr_rows = 0.0
+        self.tr_valid = 0.0
+        self.tr_in = 0.0
+        self.cur_rows = {}
+        self.fx_rows = 0.0
+        self.scores = None
+        self.top = None
+        # Номера сработавших одноразовых триггеров
+        self.fired = set()
+
+
+class EventProcessor:
+    """Обновление признаков и рекомендации клиента по одной операции.
+
+    Событие - строка транзакции или перевода в схеме CSV. Суммы клиента
+    обновляются за O(1), пересчитываются только правила продуктов, которые
+    зависят от изменившихся признаков. Пуш отправляется, когда меняется
+    лучший продукт клиента или событие попадает под триггер из
+    event_triggers конфига.
+    """
+
+    def __init__(self, processor, recommender, push_generator, triggers=None, run_date=None):
+        self.category_mapping = processor.category_mapping
+        self.transfer_mapping = processor.transfer_mapping
+        self.localized = {name: category for category, name in self.category_mapping.items()}
+        self.recommender = recommender
+        self.push_generator = push_generator
+        self.triggers = triggers if triggers is not None else recommender.config.get('event_triggers', [])
+        # Триггеры по (вид операции, категория или тип); None - любая операция вида
+        self.triggers_by_key = {}
+        for i, trigger in enumerate(self.triggers):
+            for kind, field in ((TRANSACTIONS, 'category'), (TRANSFERS, 'type')):
+                if trigger.get('kind', kind) == kind:
+                    key = (kind, trigger.get(field))
+                    self.triggers_by_key[key] = self.triggers_by_key.get(key, ()) + ((i, trigger),)
+        self.run_date = run_date or datetime.now()
+
+        self.product_names = recommender.product_names
+        self.rules = [recommender.rules[name] for name in self.product_names]
+        self.dependents = {}
+        for j, rule in enumerate(self.rules):
+            for column in rule.columns:
+                self.dependents.setdefault(column, set()).add(j)
+        self._affected_cache = {}
+        self.clients = {}
+        self.stats = {'events': 0, 'rejected': 0, 'pushes': 0}
+
+    def _affected(self, kind, name):
+        """Правила, зависящие от признаков, которые меняет любая операция этого вида"""
+        key = (kind, name)
+        affected = self._affected_cache.get(key)
+        if affected is None:
+            if kind == TRANSACTIONS:
+                columns = ['total_spent', 'avg_transaction', 'transaction_count', name]
+            else:
+                columns = ['total_transfers', 'avg_transfer', 'income_ratio', name]
+            affected = set()
+            for column in columns:
+                affected |= self.dependents.get(column, NO_RULES)
+            affected = self._affected_cache[key] = frozenset(affected)
+        return affected
+
+    def _score(self, state, products=None):
+        """Пересчёт скоров продуктов products (по умолчанию всех) и лучшего продукта"""
+        scores = state.scores
+        top = state.top
+        if scores is None or products is None:
+            scores = state.scores = [rule.evaluate(state.features) for rule in self.rules]
+            top = None
+        else:
+            for j in products:
+                scores[j] = self.rules[j].evaluate(state.features)
+
+        # При равных скорах - первый продукт в порядке конфига, как в пакетном режиме
+        if top is None or top in products:
+            top = max(range(len(scores)), key=scores.__getitem__) if scores else None
+        else:
+            for j in products:
+                if scores[j] > scores[top] or (scores[j] == scores[top] and j < top):
+                    top = j
+        state.top = top
+        return top
+
+    def seed(self, clients, aggregates=None, features=None):
+        """Начальное состояние: профили клиентов и, если есть, накопленные агрегаты"""
+        records = (features if features is not None else clients).to_dict('records')
+        for record in records:
+            for column in TOP_CATEGORY_COLUMNS + [FX_CURRENCY_COLUMN]:
+                value = record.get(column)
+                if value is not None and value != value:
+                    record[column] = None
+            record.setdefault(MODE_COLUMN, 'Unknown')
+            self.clients[record['client_code']] = ClientState(record)
+
+        if aggregates is not None and len(aggregates.client_codes):
+            self._seed_counters(aggregates)
+        for state in self.clients.values():
+            self._score(state)
+
+    def _seed_counters(self, agg):
+        """Счётчики мод и долей из ClientAggregates"""
+        def nonzero(keys, row):
+            return {key: value for key, value in zip(keys, row) if value}
+
+        for i, code in enumerate(agg.client_codes.tolist()):
+            state = self.clients.get(code)
+            if state is None:
+                continue
+            if agg.tx_keys is not None:
+                state.tx_rows = nonzero(agg.tx_keys, agg.tx_rows[i])
+                state.tx_valid = float(agg.tx_valid[i])
+                state.mode_rows = max((count for key, count in state.tx_rows.items() if key is not None), default=0.0)
+            if agg.tr_keys is not None:
+                state.tr_rows = float(agg.tr_rows[i].sum())
+                state.tr_valid = float(agg.tr_valid[i])
+                state.tr_in = float(agg.tr_in[i])
+            if agg.cur_keys is not None:
+                state.cur_rows = nonzero(agg.cur_keys, agg.cur_rows[i])
+                state.fx_rows = max((count for key, count in state.cur_rows.items()
+                                     if key is not None and key != BASE_CURRENCY), default=0.0)
+
+    def _new_client(self, code, record):
+        features = {'client_code': code, MODE_COLUMN: 'Unknown'}
+        for column in PROFILE_COLUMNS:
+            if column in record:
+                features[column] = record[column]
+        state = self.clients[code] = ClientState(features)
+        self._score(state)
+        return state
+
+    def _update_top_categories(self, features, name, grew):
+        """Топ-3 категорий трат после изменения категории name.
+
+        Если сумма выросла, новый топ выбирается из прежнего топа и name;
+        полный пересчёт нужен только при уменьшении суммы.
+        """
+        localized = self.localized.get(name)
+        if localized is None:
+            return False
+        current = [features.get(column) for column in TOP_CATEGORY_COLUMNS]
+        if grew:
+            third = current[-1]
+            if localized not in current and third is not None:
+                third_column = self.category_mapping[third]
+                if (-features.get(name, 0), name) > (-features[third_column], third_column):
+                    return False
+            candidates = {self.category_mapping[category] for category in current if category is not None}
+            candidates.add(name)
+        else:
+            candidates = self.localized
+
+        # При равных суммах - в порядке имён колонок, как в пакетной сборке
+        spending = sorted((-features.get(column, 0), column) for column in candidates
+                          if features.get(column, 0) > 0)
+        top = [self.localized[column] for _, column in spending[:len(TOP_CATEGORY_COLUMNS)]]
+        top += [None] * (len(TOP_CATEGORY_COLUMNS) - len(top))
+        if top == current:
+            return False
+        for column, value in zip(TOP_CATEGORY_COLUMNS, top):
+            features[column] = value
+        return True
+
+    def _count_currency(self, state, currency):
+        """Самая частая иностранная валюта; при равенстве - первая по алфавиту"""
+        if currency is None or currency != currency:
+            return False
+        count = state.cur_rows[currency] = state.cur_rows.get(currency, 0.0) + 1
+        if currency == BASE_CURRENCY:
+            return False
+        features = state.features
+        current = features.get(FX_CURRENCY_COLUMN)
+        if count > state.fx_rows or (count == state.fx_rows and (current is None or currency < current)):
+            state.fx_rows = count
+            if currency != current:
+                features[FX_CURRENCY_COLUMN] = currency
+                return True
+        return False
+
+    def _apply_transaction(self, state, record):
+        features = state.features
+        category = record.get('category') or None
+        name = self.category_mapping.get(category, 'other')
+        amount = _amount(record.get('amount'))
+        changed = self._affected(TRANSACTIONS, name)
+
+        count = state.tx_rows[category] = state.tx_rows.get(category, 0.0) + 1
+        if amount is not None:
+            state.tx_valid += 1
+            features['total_spent'] = features.get('total_spent', 0.0) + amount
+            features[name] = features.get(name, 0.0) + amount
+        features['transaction_count'] = state.tx_valid
+        features['avg_transaction'] = features.get('total_spent', 0.0) / state.tx_valid if state.tx_valid else 0.0
+
+        # Мода: счётчики только растут, поэтому достаточно сравнить с текущей
+        if category is not None:
+            mode = features.get(MODE_COLUMN)
+            if count > state.mode_rows or (count == state.mode_rows and (mode == 'Unknown' or category < mode)):
+                state.mode_rows = count
+                if category != mode:
+                    features[MODE_COLUMN] = category
+                    changed |= self.dependents.get(MODE_COLUMN, NO_RULES)
+
+        if amount is not None and self._update_top_categories(features, name, amount > 0):
+            for column in TOP_CATEGORY_COLUMNS:
+                changed |= self.dependents.get(column, NO_RULES)
+        return changed
+
+    def _apply_transfer(self, state, record):
+        features = state.features
+        transfer_type = record.get('type') or None
+        name = self.transfer_mapping.get(transfer_type, 'other')
+        amount = _amount(record.get('amount'))
+
+        state.tr_rows += 1
+        if record.get('direction') == 'in':
+            state.tr_in += 1
+        if amount is not None:
+            state.tr_valid += 1
+            features['total_transfers'] = features.get('total_transfers', 0.0) + amount
+            features[name] = features.get(name, 0.0) + amount
+        features['avg_transfer'] = features.get('total_transfers', 0.0) / state.tr_valid if state.tr_valid else 0.0
+        features['income_ratio'] = state.tr_in / state.tr_rows
+        return self._affected(TRANSFERS, name)
+
+    def _triggered(self, state, kind, record):
+        """Номер первого сработавшего триггера или None"""
+        key = record.get('category' if kind == TRANSACTIONS else 'type')
+        candidates = self.triggers_by_key.get((kind, key), ()) + self.triggers_by_key.get((kind, None), ())
+        for i, trigger in sorted(candidates) if len(candidates) > 1 else candidates:
+            amount = _amount(record.get('amount'))
+            if amount is None or amount < trigger.get('min_amount', 0):
+                continue
+            if trigger.get('once', True):
+                if i in state.fired:
+                    continue
+                state.fired.add(i)
+            return i
+        return None
+
+    def process(self, record):
+        """Учёт одного события; возвращает пуш (dict) или None"""
+        if 'category' in record:
+            kind = TRANSACTIONS
+        elif 'type' in record:
+            kind = TRANSFERS
+        else:
+            kind = None
+        try:
+            code = int(record['client_code'])
+        except (KeyError, TypeError, ValueError):
+            code = None
+        if kind is None or code is None or not _valid_date(record.get('date')):
+            self.stats['rejected'] += 1
+            return None
+        self.stats['events'] += 1
+
+        state = self.clients.get(code)
+        if state is None:
+            state = self._new_client(code, record)
+        previous = state.top
+
+        if kind == TRANSACTIONS:
+            changed = self._apply_transaction(state, record)
+        else:
+            changed = self._apply_transfer(state, record)
+        if self._count_currency(state, record.get('currency') or None):
+            changed |= self.dependents.get(FX_CURRENCY_COLUMN, NO_RULES)
+        top = self._score(state, changed)
+
+        trigger = self._triggered(state, kind, record)
+        if top is None or (top == previous and trigger is None):
+            return None
+
+        product = self.product_names[top]
+        self.stats['pushes'] += 1
+        return {
+            'client_code': code,
+            'product': product,
+            'push_notification': self.push_generator.generate_push(
+                product, state.features, state.features, self.run_date),
+            'reason': 'top_product' if top != previous else f"trigger:{self.triggers[trigger].get('name', trigger)}"
+        }
+
+    def process_lines(self, lines):
+        """События из JSON-строк; генератор пушей"""
+        loads = json.loads
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = loads(line)
+            except ValueError:
+                self.stats['rejected'] += 1
+                continue
+            push = self.process(record)
+            if push is not None:
+                yield push
+
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            self.server.events.put(line)
+
+
+def socket_lines(host, port):
+    """JSON-строки из TCP-соединений; соединения читаются в потоках, события - через очередь"""
+    events = queue.Queue(maxsize=100000)
+    server = socketserver.ThreadingTCPServer((host, port), _LineHandler)
+    server.daemon_threads = True
+    server.events = events
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Приём событий на {host}:{server.server_address[1]}", file=sys.stderr, flush=True)
+    return iter(events.get, None)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Обновление рекомендаций по потоку операций (JSON-строки)")
+    parser.add_argument('--data-dir', default='data',
+                        help="Папка с clients.csv и историей операций для начального состояния")
+    parser.add_argument('--feature-state',
+                        help="Начальные агрегаты из состояния daily_update.py вместо файлов")
+    parser.add_argument('--no-history', action='store_true',
+                        help="Начать с нулевых агрегатов: только профили клиентов")
+    parser.add_argument('--socket', metavar='HOST:PORT',
+                        help="Читать события из TCP-сокета вместо stdin")
+    parser.add_argument('--config', default='config/product_config.json')
+    parser.add_argument('--templates', default='templates/push_templates.json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from main import load_clients
+
+    args = parse_args(argv)
+    processor = DataProcessor()
+    events = EventProcessor(processor, ProductRecommender(args.config), PushGenerator(args.templates))
+
+    clients = load_clients(args.data_dir)
+    aggregates = None
+    if args.feature_state:
+        aggregates = FeatureState.load(args.feature_state, processor.feature_engine).aggregates()
+    elif not args.no_history:
+        data = DataLoader().load(args.data_dir, clients['client_code'].tolist())
+        aggregates = processor.feature_engine.aggregate(data[TRANSACTIONS], data[TRANSFERS])
+    features = None
+    if aggregates is not None:
+        features = processor.feature_engine.assemble(clients, aggregates).to_frame()
+    events.seed(clients, aggregates, features)
+    print(f"Клиентов в состоянии: {len(events.clients)}", file=sys.stderr, flush=True)
+
+    if args.socket:
+        host, _, port = args.socket.rpartition(':')
+        lines = socket_lines(host or '127.0.0.1', int(port))
+    else:
+        lines = sys.stdin
+
+    write = sys.stdout.write
+    try:
+        for push in events.process_lines(lines):
+            write(json.dumps(push, ensure_ascii=False) + '\n')
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    print(f"Событий: {events.stats['events']}, отклонено: {events.stats['rejected']}, "
+          f"пушей: {events.stats['pushes']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
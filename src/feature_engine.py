@@ -0,0 +1,308 @@
+import numpy as np
+import pandas as pd
+from metrics import metrics
+from scoring_rules import top_indices
+
+TRANSACTION_STATS = ['total_spent', 'avg_transaction', 'transaction_count', 'most_common_category']
+TRANSFER_STATS = ['total_transfers', 'avg_transfer', 'income_ratio']
+TOP_CATEGORY_COLUMNS = ['top_category_1', 'top_category_2', 'top_category_3']
+# Счётчики строк: в матрице они float, в DataFrame - int64, как в прежней предобработке
+INTEGER_COLUMNS = ['transaction_count']
+FX_CURRENCY_COLUMN = 'fx_currency'
+BASE_CURRENCY = 'KZT'
+
+
+def encode(values):
+    """Целочисленные коды и отсортированный словарь значений (NaN -> -1)"""
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, list(np.asarray(uniques, dtype=object))
+
+
+def grouped_sum(row_index, key_codes, n_rows, n_keys, weights=None):
+    """Сумма весов по парам (строка, ключ) одним проходом bincount"""
+    flat = row_index * n_keys + key_codes
+    result = np.bincount(flat, weights=weights, minlength=n_rows * n_keys)
+    return result.astype(np.float64, copy=False).reshape(n_rows, n_keys)
+
+
+class ClientAggregates:
+    """Суммы и счётчики по клиентам, из которых собираются признаки.
+
+    Ключи транзакций - исходные категории, ключи переводов - исходные типы,
+    ключи валют - коды валют; NaN-ключ хранится последним под именем None.
+    """
+
+    def __init__(self, client_codes, tx_keys=None, tx_sum=None, tx_rows=None, tx_valid=None,
+                 tr_keys=None, tr_sum=None, tr_rows=None, tr_valid=None, tr_in=None,
+                 cur_keys=None, cur_rows=None):
+        self.client_codes = np.asarray(client_codes)
+        self.tx_keys = tx_keys
+        self.tx_sum = tx_sum
+        self.tx_rows = tx_rows
+        self.tx_valid = tx_valid
+        self.tr_keys = tr_keys
+        self.tr_sum = tr_sum
+        self.tr_rows = tr_rows
+        self.tr_valid = tr_valid
+        self.tr_in = tr_in
+        # Число операций по валютам, транзакции и переводы вместе
+        self.cur_keys = cur_keys
+        self.cur_rows = cur_rows
+
+    @property
+    def has_transactions(self):
+        return self.tx_keys is not None
+
+    @property
+    def has_transfers(self):
+        return self.tr_keys is not None
+
+
+class FeatureMatrix:
+    """Плотная матрица признаков клиентов с картой колонок"""
+
+    def __init__(self, clients, values, columns, labels, order=None):
+        self.clients = clients
+        self.values = values
+        self.columns = list(columns)
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+        # Строковые признаки (например most_common_category) хранятся отдельно
+        self.labels = labels
+        # Порядок колонок в DataFrame, совпадающий с исходной цепочкой merge
+        self.order = order or self.columns + list(labels)
+
+    def __len__(self):
+        return len(self.values)
+
+    def column(self, name):
+        return self.values[:, self.column_index[name]]
+
+    def to_frame(self):
+        """DataFrame в формате DataProcessor.preprocess_data"""
+        blocks = {name: self.values[:, i] for i, name in enumerate(self.columns)}
+        blocks.update(self.labels)
+        features = pd.concat([
+            self.clients.reset_index(drop=True),
+            pd.DataFrame({name: blocks[name] for name in self.order})
+        ], axis=1)
+
+        numeric_cols = features.select_dtypes(include=[np.number]).columns
+        features[numeric_cols] = features[numeric_cols].fillna(0)
+        for name in INTEGER_COLUMNS:
+            if name in self.column_index:
+                features[name] = features[name].astype(np.int64)
+
+        categorical_cols = features.select_dtypes(include=['object']).columns
+        features[categorical_cols] = features[categorical_cols].fillna('Unknown')
+        return features
+
+
+class FeatureEngine:
+    """Построение всех агрегатов клиента за один сгруппированный проход"""
+
+    def __init__(self, category_mapping, transfer_mapping):
+        self.category_mapping = category_mapping
+        self.transfer_mapping = transfer_mapping
+
+    @staticmethod
+    def _valid_rows(df):
+        """Строки с корректной датой, как в исходной предобработке"""
+        dates = df['date']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, errors='coerce')
+        return df[dates.notna().to_numpy()]
+
+    @staticmethod
+    def _encode_keys(values):
+        """Коды ключей, где NaN получает последний индекс"""
+        codes, keys = encode(values)
+        if (codes < 0).any():
+            codes = np.where(codes < 0, len(keys), codes)
+            keys.append(None)
+        return codes, keys
+
+    def aggregate(self, transactions, transfers):
+        """Агрегаты по всем клиентам, встречающимся в данных"""
+        has_tx = transactions is not None and not transactions.empty
+        has_tr = transfers is not None and not transfers.empty
+        if has_tx:
+            transactions = self._valid_rows(transactions)
+        if has_tr:
+            transfers = self._valid_rows(transfers)
+
+        frames = [df['client_code'] for df, present in ((transactions, has_tx), (transfers, has_tr)) if present]
+        if not frames:
+            return ClientAggregates(np.array([], dtype=np.int64))
+        client_index = pd.Index(pd.concat(frames, ignore_index=True).unique())
+        n = len(client_index)
+        agg = ClientAggregates(client_index.to_numpy())
+
+        if has_tx:
+            with metrics.stage('aggregate_transactions', rows=len(transactions)):
+                rows = client_index.get_indexer(transactions['client_code'])
+                codes, keys = self._encode_keys(transactions['category'])
+                amount = transactions['amount'].to_numpy(dtype=np.float64)
+                valid = ~np.isnan(amount)
+                amount = np.where(valid, amount, 0.0)
+
+                agg.tx_keys = keys
+                agg.tx_sum = grouped_sum(rows, codes, n, len(keys), amount)
+                agg.tx_rows = grouped_sum(rows, codes, n, len(keys))
+                agg.tx_valid = np.bincount(rows, weights=valid, minlength=n)
+
+        if has_tr:
+            with metrics.stage('aggregate_transfers', rows=len(transfers)):
+                rows = client_index.get_indexer(transfers['client_code'])
+                codes, keys = self._encode_keys(transfers['type'])
+                amount = transfers['amount'].to_numpy(dtype=np.float64)
+                valid = ~np.isnan(amount)
+                amount = np.where(valid, amount, 0.0)
+                incoming = (transfers['direction'] == 'in').to_numpy()
+
+                agg.tr_keys = keys
+                agg.tr_sum = grouped_sum(rows, codes, n, len(keys), amount)
+                agg.tr_rows = grouped_sum(rows, codes, n, len(keys))
+                agg.tr_valid = np.bincount(rows, weights=valid, minlength=n)
+                agg.tr_in = np.bincount(rows, weights=incoming, minlength=n)
+
+        currencies = [(df, present) for df, present in ((transactions, has_tx), (transfers, has_tr))
+                      if present and 'currency' in df.columns]
+        if currencies:
+            with metrics.stage('aggregate_currencies', rows=sum(len(df) for df, _ in currencies)):
+                rows = np.concatenate([client_index.get_indexer(df['client_code']) for df, _ in currencies])
+                values = pd.concat([df['currency'].astype(object) for df, _ in currencies], ignore_index=True)
+                codes, keys = self._encode_keys(values)
+                agg.cur_keys = keys
+                agg.cur_rows = grouped_sum(rows, codes, n, len(keys))
+
+        return agg
+
+    @staticmethod
+    def _mapped_columns(keys, key_totals, mapping):
+        """Матрица перехода из исходных ключей в колонки признаков"""
+        names = [mapping.get(key, 'other') if key is not None else 'other' for key in keys]
+        columns = sorted({name for name, total in zip(names, key_totals) if total > 0})
+        position = {name: i for i, name in enumerate(columns)}
+        projection = np.zeros((len(keys), len(columns)))
+        for i, name in enumerate(names):
+            if name in position:
+                projection[i, position[name]] = 1.0
+        return columns, projection
+
+    @staticmethod
+    def _add_block(features, block):
+        """Добавление колонок с суффиксами _x/_y при совпадении имён, как в merge"""
+        overlap = {name for name in block if name in features}
+        if overlap:
+            renamed = {(name + '_x' if name in overlap else name): values for name, values in features.items()}
+            features.clear()
+            features.update(renamed)
+        for name, values in block.items():
+            features[name + '_y' if name in overlap else name] = values
+
+    def _top_categories(self, spending, columns, n=3):
+        """Топ-N категорий трат с названиями на русском; пустые места - NaN"""
+        localized = {name: category for category, name in self.category_mapping.items()}
+        candidates = [i for i, name in enumerate(columns) if name in localized]
+        names = np.array([localized[columns[i]] for i in candidates] + [None], dtype=object)
+        values = np.nan_to_num(spending[:, candidates])
+
+        # При равных тратах - в порядке колонок
+        order = top_indices(values, n)
+        top_values = np.take_along_axis(values, order, axis=1)
+        order = np.where(top_values > 0, order, len(candidates))
+        return {
+            column: pd.Categorical(names[order[:, i]] if i < order.shape[1] else np.full(len(values), None))
+            for i, column in enumerate(TOP_CATEGORY_COLUMNS[:n])
+        }
+
+    @staticmethod
+    def _dominant_currency(cur_rows, cur_keys):
+        """Самая частая иностранная валюта клиента; без валютных операций - NaN"""
+        foreign = [i for i, key in enumerate(cur_keys) if key is not None and key != BASE_CURRENCY]
+        names = np.array([cur_keys[i] for i in foreign] + [None], dtype=object)
+        if not foreign:
+            return pd.Categorical(np.full(len(cur_rows), None))
+        counts = np.nan_to_num(cur_rows[:, foreign])
+        best = np.where(counts.max(axis=1) > 0, np.argmax(counts, axis=1), len(foreign))
+        return pd.Categorical(names[best])
+
+    def assemble(self, clients, agg):
+        """Сборка матрицы признаков для клиентов из агрегатов"""
+        rows = pd.Index(agg.client_codes).get_indexer(clients['client_code'])
+        present = rows >= 0
+        rows = np.where(present, rows, 0)
+
+        def take(values):
+            """Строки агрегатов в порядке clients; отсутствующие клиенты -> NaN"""
+            if len(values) == 0:
+                return np.full((len(rows),) + values.shape[1:], np.nan)
+            mask = present if values.ndim == 1 else present[:, None]
+            return np.where(mask, values[rows], np.nan)
+
+        # Колонки клиентов участвуют только в разрешении конфликтов имён
+        features = {col: None for col in clients.columns if col != 'client_code'}
+
+        if agg.has_transactions:
+            columns, projection = self._mapped_columns(
+                agg.tx_keys, agg.tx_rows.sum(axis=0), self.category_mapping)
+            tx_sum = take(agg.tx_sum)
+            tx_rows = np.nan_to_num(take(agg.tx_rows))
+            tx_valid = take(agg.tx_valid)
+            total = tx_sum.sum(axis=1)
+            avg = np.divide(total, tx_valid, out=np.full(len(total), np.nan), where=tx_valid > 0)
+
+            # Мода: при равенстве берётся первая категория в порядке сортировки
+            mode_labels = np.full(len(rows), np.nan, dtype=object)
+            mode_labels[present] = 'Unknown'
+            mode_keys = [i for i, key in enumerate(agg.tx_keys) if key is not None]
+            if mode_keys:
+                counts = tx_rows[:, mode_keys]
+                has_mode = counts.max(axis=1) > 0
+                key_names = np.array([agg.tx_keys[i] for i in mode_keys], dtype=object)
+                mode_labels[has_mode] = key_names[np.argmax(counts, axis=1)[has_mode]]
+
+            block = {'total_spent': total, 'avg_transaction': avg,
+                     'transaction_count': tx_valid, 'most_common_category': mode_labels}
+            self._add_block(features, block)
+            spending = tx_sum @ projection
+            self._add_block(features, {name: spending[:, i] for i, name in enumerate(columns)})
+            top_categories = self._top_categories(spending, columns)
+
+        if agg.has_transfers:
+            columns, projection = self._mapped_columns(
+                agg.tr_keys, agg.tr_rows.sum(axis=0), self.transfer_mapping)
+            tr_sum = take(agg.tr_sum)
+            tr_rows = take(agg.tr_rows).sum(axis=1)
+            tr_valid = take(agg.tr_valid)
+            tr_in = take(agg.tr_in)
+            total = tr_sum.sum(axis=1)
+            avg = np.divide(total, tr_valid, out=np.full(len(total), np.nan), where=tr_valid > 0)
+            ratio = np.divide(tr_in, tr_rows, out=np.where(present, 0.0, np.nan), where=tr_rows > 0)
+
+            block = {'total_transfers': total, 'avg_transfer': avg, 'income_ratio': ratio}
+            self._add_block(features, block)
+            amounts = tr_sum @ projection
+            self._add_block(features, {name: amounts[:, i] for i, name in enumerate(columns)})
+
+        # Параметры пушей: компактные категориальные колонки
+        if agg.has_transactions:
+            self._add_block(features, top_categories)
+        if agg.cur_keys is not None:
+            self._add_block(features, {FX_CURRENCY_COLUMN: self._dominant_currency(take(agg.cur_rows), agg.cur_keys)})
+
+        is_label = lambda values: isinstance(values, pd.Categorical) or values.dtype == object
+        numeric = {name: values for name, values in features.items()
+                   if values is not None and not is_label(values)}
+        labels = {name: values for name, values in features.items()
+                  if values is not None and is_label(values)}
+        values = np.column_stack(list(numeric.values())) if numeric else np.empty((len(rows), 0))
+        order = [name for name, values in features.items() if values is not None]
+        return FeatureMatrix(clients, values, list(numeric), labels, order)
+
+    def build(self, clients, transactions, transfers):
+        """Агрегация и сборка признаков за один вызов"""
+        agg = self.aggregate(transactions, transfers)
+        # Сборка колонок признаков заменяет прежнюю цепочку merge
+        with metrics.stage('assemble', rows=len(clients)):
+            return self.assemble(clients, agg)
@@ -0,0 +1,253 @@
+import os
+import pickle
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from feature_engine import ClientAggregates
+
+STATE_VERSION = 1
+DEFAULT_WINDOW_DAYS = 92
+
+# Поля агрегатов: (двумерные массивы, их ключи) и одномерные счётчики
+KEYED_FIELDS = {
+    'tx_keys': ['tx_sum', 'tx_rows'],
+    'tr_keys': ['tr_sum', 'tr_rows'],
+    'cur_keys': ['cur_rows'],
+}
+ROW_FIELDS = {
+    'tx_keys': ['tx_valid'],
+    'tr_keys': ['tr_valid', 'tr_in'],
+    'cur_keys': [],
+}
+# Сумма обнуляется вместе со счётчиком строк, чтобы не копить ошибку округления
+ZEROED_WITH = {'tx_sum': 'tx_rows', 'tr_sum': 'tr_rows'}
+
+
+def _key_order(key):
+    """Порядок ключей как у pd.factorize(sort=True): NaN-ключ (None) последним"""
+    return (key is None, key or '')
+
+
+def _resize(target, keys_name, n, keys):
+    """Перенос массивов одного вида операций на n клиентов и словарь keys"""
+    old_keys = getattr(target, keys_name)
+    for field in KEYED_FIELDS[keys_name] + ROW_FIELDS[keys_name]:
+        values = getattr(target, field)
+        if field in KEYED_FIELDS[keys_name]:
+            expanded = np.zeros((n, len(keys)))
+            if values is not None:
+                position = {key: i for i, key in enumerate(keys)}
+                expanded[:len(values), [position[key] for key in old_keys]] = values
+        else:
+            expanded = np.zeros(n)
+            if values is not None:
+                expanded[:len(values)] = values
+        setattr(target, field, expanded)
+    setattr(target, keys_name, keys)
+
+
+def add_aggregates(target, source, sign=1.0):
+    """target += sign * source с объединением клиентов и ключей; возвращает target.
+
+    Массивы перестраиваются только при появлении новых клиентов или ключей,
+    иначе обновляются на месте строк source.
+    """
+    rows = pd.Index(target.client_codes).get_indexer(source.client_codes)
+    new_codes = source.client_codes[rows < 0]
+    if len(new_codes):
+        target.client_codes = np.concatenate([target.client_codes, new_codes])
+        rows = pd.Index(target.client_codes).get_indexer(source.client_codes)
+    n = len(target.client_codes)
+
+    for keys_name, fields in KEYED_FIELDS.items():
+        target_keys = getattr(target, keys_name)
+        source_keys = getattr(source, keys_name)
+
+        # Словарь ключей держится отсортированным, как при полном пересчёте
+        if source_keys is not None and (target_keys is None or not set(source_keys) <= set(target_keys)):
+            keys = sorted(set(target_keys or []) | set(source_keys), key=_key_order)
+            _resize(target, keys_name, n, keys)
+        elif target_keys is not None and len(new_codes):
+            _resize(target, keys_name, n, target_keys)
+        if source_keys is None:
+            continue
+
+        position = {key: i for i, key in enumerate(getattr(target, keys_name))}
+        columns = np.array([position[key] for key in source_keys], dtype=np.intp)
+        cells = np.ix_(rows, columns)
+        for field in fields:
+            values = getattr(target, field)
+            values[cells] += sign * getattr(source, field)
+        for field in ROW_FIELDS[keys_name]:
+            getattr(target, field)[rows] += sign * getattr(source, field)
+
+        for field, counter in ZEROED_WITH.items():
+            if field in fields:
+                values = getattr(target, field)
+                emptied = getattr(target, counter)[cells] <= 0
+                if emptied.any():
+                    block = values[cells]
+                    block[emptied] = 0.0
+                    values[cells] = block
+
+    return target
+
+
+class FeatureState:
+    """Сохраняемое состояние агрегатов клиентов для ежедневного обновления признаков.
+
+    Новые строки раскладываются по дневным корзинам и добавляются к текущим
+    суммам; корзины, вышедшие из окна window_days, вычитаются. Признаки
+    собираются из сумм тем же FeatureEngine.assemble, что и при полном
+    пересчёте, поэтому результат совпадает с пересчётом по строкам окна.
+    """
+
+    def __init__(self, engine, window_days=DEFAULT_WINDOW_DAYS):
+        self.engine = engine
+        self.window_days = window_days
+        self.totals = ClientAggregates(np.array([], dtype=np.int64))
+        # Дневные корзины: дата -> ClientAggregates строк этого дня
+        self.days = {}
+        self.as_of = None
+        # Учтённые файлы: абсолютный путь -> mtime и размер, как в манифесте DataCache
+        self.sources = {}
+
+    @staticmethod
+    def _days_of(df):
+        if df is None or df.empty:
+            return None
+        dates = df['date']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, errors='coerce')
+        return dates.dt.normalize()
+
+    @staticmethod
+    def _source_signature(path):
+        stat = os.stat(path)
+        return {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+
+    def new_sources(self, files):
+        """Файлы (path, kind, client_code), ещё не учтённые в состоянии.
+
+        Уже учтённый без изменений файл пропускается: повторное сложение
+        удвоило бы его суммы. Изменившийся учтённый файл - ошибка: какие
+        строки в нём новые, по файлу не понять.
+        """
+        result = []
+        for entry in files:
+            key = os.path.abspath(entry[0])
+            folded = self.sources.get(key)
+            if folded is None:
+                result.append(entry)
+            elif folded == self._source_signature(key):
+                print(f"Файл уже учтён в состоянии, пропущен: {entry[0]}")
+            else:
+                raise ValueError(f"Файл {entry[0]} изменился после того, как был учтён в состоянии")
+        return result
+
+    def add_sources(self, files):
+        """Отметка файлов как учтённых; вызывается после add_rows с их строками"""
+        for entry in files:
+            key = os.path.abspath(entry[0])
+            self.sources[key] = self._source_signature(key)
+
+    def add_rows(self, transactions, transfers):
+        """Добавление новых строк; стоимость пропорциональна объёму новых данных"""
+        tx_days = self._days_of(transactions)
+        tr_days = self._days_of(transfers)
+        days = set()
+        for values in (tx_days, tr_days):
+            if values is not None:
+                days.update(values.dropna().unique())
+
+        for day in sorted(days):
+            day_tx = transactions[(tx_days == day).to_numpy()] if tx_days is not None else None
+            day_tr = transfers[(tr_days == day).to_numpy()] if tr_days is not None else None
+            bucket = self.engine.aggregate(day_tx, day_tr)
+
+            key = pd.Timestamp(day).date()
+            if key in self.days:
+                add_aggregates(self.days[key], bucket)
+            else:
+                self.days[key] = add_aggregates(ClientAggregates(np.array([], dtype=np.int64)), bucket)
+            add_aggregates(self.totals, bucket)
+            self.as_of = max(self.as_of, key) if self.as_of is not None else key
+
+        self.expire()
+
+    def expire(self, as_of=None):
+        """Вычитание корзин старше окна window_days, считая от последнего дня"""
+        as_of = as_of or self.as_of
+        if as_of is None:
+            return
+        first_day = as_of - timedelta(days=self.window_days - 1)
+        for day in sorted(day for day in self.days if day < first_day):
+            add_aggregates(self.totals, self.days.pop(day), sign=-1.0)
+
+    def aggregates(self):
+        """Текущие суммы; типы операций без строк в окне считаются отсутствующими"""
+        totals = self.totals
+        view = ClientAggregates(totals.client_codes)
+        view.__dict__.update(totals.__dict__)
+        if totals.tx_rows is None or not totals.tx_rows.sum() > 0:
+            view.tx_keys = None
+        if totals.tr_rows is None or not totals.tr_rows.sum() > 0:
+            view.tr_keys = None
+        if totals.cur_rows is None or not totals.cur_rows.sum() > 0:
+            view.cur_keys = None
+        return view
+
+    def features(self, clients):
+        """Матрица признаков клиентов из текущего состояния"""
+        return self.engine.assemble(clients.reset_index(drop=True), self.aggregates())
+
+    def save(self, path):
+        """Атомарное сохранение состояния"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'version': STATE_VERSION,
+                'window_days': self.window_days,
+                'as_of': self.as_of,
+                'sources': self.sources,
+                'totals': self.totals.__dict__,
+                'days': {day: bucket.__dict__ for day, bucket in self.days.items()}
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, engine, window_days=None):
+        """Загрузка состояния с окном, с которым оно строилось.
+
+        window_days=None - окно берётся из файла; другое окно, другая версия
+        или состав агрегатов, как и отсутствие файла, - ошибка: признаки из
+        пустого состояния выглядели бы как клиенты без операций.
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Нет состояния признаков {path}: сначала запустите daily_update.py") from None
+        if data.get('version') != STATE_VERSION:
+            raise ValueError(f"Несовместимая версия состояния признаков в {path}")
+        fields = set(ClientAggregates(np.array([], dtype=np.int64)).__dict__)
+        if set(data['totals']) != fields or any(set(bucket) != fields for bucket in data['days'].values()):
+            raise ValueError(f"Состав агрегатов в {path} не совпадает с текущим FeatureEngine")
+        if window_days is not None and data['window_days'] != window_days:
+            raise ValueError(f"Состояние {path} построено с окном {data['window_days']} дн., "
+                             f"запрошено {window_days} дн.")
+
+        def restore(fields):
+            aggregates = ClientAggregates(fields['client_codes'])
+            aggregates.__dict__.update(fields)
+            return aggregates
+
+        state = cls(engine, data['window_days'])
+        state.as_of = data['as_of']
+        state.sources = data.get('sources', {})
+        state.totals = restore(data['totals'])
+        state.days = {day: restore(fields) for day, fields in data['days'].items()}
+        return state
@@ -0,0 +1,132 @@
+import sys
+import numpy as np
+import pandas as pd
+
+_MISSING = object()
+
+
+class ClientView:
+    """Признаки одного клиента из FeatureStore с интерфейсом dict.get без копии в dict"""
+
+    __slots__ = ('store', 'row', '_values')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+        self._values = None
+
+    def get(self, name, default=None):
+        store = self.store
+        i = store.column_index.get(name)
+        if i is not None:
+            # Строка матрицы переводится в список один раз на клиента
+            if self._values is None:
+                self._values = store.values[self.row].tolist()
+            return self._values[i]
+        vocabulary = store.vocabularies.get(name)
+        if vocabulary is not None:
+            code = store.label_codes[name][self.row]
+            return vocabulary[code] if code >= 0 else default
+        if name == 'client_code':
+            return int(store.client_codes[self.row])
+        return default
+
+    def __getitem__(self, name):
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return name in self.store
+
+    def keys(self):
+        return self.store.columns
+
+    def to_dict(self):
+        return {name: self.get(name) for name in self.store.columns}
+
+
+class FeatureStore:
+    """Компактное хранилище признаков клиентов для долгоживущих процессов.
+
+    Числовые признаки лежат в одной float32-матрице с картой колонок,
+    строковые (city, status, most_common_category, ...) - целочисленными
+    кодами со словарём значений. Колонки отдаются как pd.Series, поэтому
+    хранилище подходит вместо DataFrame в ProductRecommender.score_batch и
+    PushGenerator.generate_batch; для одного клиента есть ClientView.
+    """
+
+    def __init__(self, client_codes, values, numeric_columns, label_codes, vocabularies, columns=None):
+        self.client_codes = np.asarray(client_codes, dtype=np.int64)
+        self.values = values
+        self.column_index = {name: i for i, name in enumerate(numeric_columns)}
+        self.label_codes = label_codes
+        self.vocabularies = vocabularies
+        self.columns = list(columns) if columns is not None else (
+            ['client_code'] + list(numeric_columns) + list(label_codes))
+
+        # Поиск строки по коду клиента - бинарный поиск по отсортированным кодам
+        self._order = np.argsort(self.client_codes, kind='stable')
+        self._sorted_codes = self.client_codes[self._order]
+
+    @classmethod
+    def from_frame(cls, features):
+        """Хранилище из DataFrame в формате DataProcessor.preprocess_data"""
+        numeric_columns, label_columns = [], []
+        for name in features.columns:
+            if name == 'client_code':
+                continue
+            if pd.api.types.is_numeric_dtype(features[name]) and not pd.api.types.is_bool_dtype(features[name]):
+                numeric_columns.append(name)
+            else:
+                label_columns.append(name)
+
+        values = np.empty((len(features), len(numeric_columns)), dtype=np.float32)
+        for i, name in enumerate(numeric_columns):
+            values[:, i] = features[name].to_numpy(dtype=np.float32)
+
+        label_codes, vocabularies = {}, {}
+        for name in label_columns:
+            codes, uniques = pd.factorize(features[name])
+            label_codes[name] = codes.astype(np.int32)
+            vocabularies[name] = [str(value) for value in uniques]
+
+        return cls(features['client_code'].to_numpy(dtype=np.int64), values, numeric_columns,
+                   label_codes, vocabularies, features.columns)
+
+    def __len__(self):
+        return len(self.client_codes)
+
+    def __contains__(self, name):
+        return name in self.column_index or name in self.label_codes or name == 'client_code'
+
+    def __getitem__(self, name):
+        """Колонка как pd.Series: числа - float64, строки - категориальная колонка"""
+        i = self.column_index.get(name)
+        if i is not None:
+            return pd.Series(self.values[:, i].astype(np.float64), name=name)
+        if name in self.label_codes:
+            return pd.Series(pd.Categorical.from_codes(self.label_codes[name], self.vocabularies[name]), name=name)
+        if name == 'client_code':
+            return pd.Series(self.client_codes, name=name)
+        raise KeyError(name)
+
+    def row(self, client_code):
+        """Номер строки клиента или None"""
+        position = np.searchsorted(self._sorted_codes, client_code)
+        if position < len(self._sorted_codes) and self._sorted_codes[position] == client_code:
+            return int(self._order[position])
+        return None
+
+    def view(self, client_code):
+        """ClientView клиента или None, если клиента нет"""
+        row = self.row(client_code)
+        return ClientView(self, row) if row is not None else None
+
+    def nbytes(self):
+        """Память массивов и словарей хранилища в байтах"""
+        total = self.values.nbytes + self.client_codes.nbytes + self._order.nbytes + self._sorted_codes.nbytes
+        total += sum(codes.nbytes for codes in self.label_codes.values())
+        total += sum(sys.getsizeof(value) for vocabulary in self.vocabularies.values() for value in vocabulary)
+        return total
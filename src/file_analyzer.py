@@ -1,23 +1,72 @@
 import os
-import pandas as pd
+import csv
+import itertools
+
+
+def detect_encoding(file_path, size=64 * 1024):
+    """Кодировка по началу файла: UTF-8 с BOM, UTF-8 или неизвестная"""
+    with open(file_path, 'rb') as f:
+        content = f.read(size)
+    if content.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    try:
+        # Обрезанный на границе блока многобайтный символ ошибкой не считается
+        content.decode('utf-8')
+    except UnicodeDecodeError as e:
+        if e.start < len(content) - 3:
+            return None
+    return 'utf-8'
+
+
+def read_head(file_path, rows=2, encoding='utf-8'):
+    """Заголовок и первые строки CSV без загрузки всего файла"""
+    with open(file_path, 'r', encoding=encoding, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        return header, list(itertools.islice(reader, rows))
+
+
+def analyze_data_folder(data_folder='data', rows=2):
+    """Анализ структуры файлов в папке: колонки, первые строки и кодировка.
+
+    Читается только начало каждого файла модулем csv, поэтому анализ не
+    тянет pandas и не зависит от размера файлов.
+    """
+    if not os.path.isdir(data_folder):
+        print(f"Папка {data_folder} не существует!")
+        return
+
+    files = sorted(os.listdir(data_folder))
+    print(f"Найдено файлов: {len(files)}")
 
-def analyze_data_folder(data_folder):
-    """Анализ структуры файлов в папке"""
-    files = os.listdir(data_folder)
-    
-    print("Файлы в папке data:")
     for file in files:
         file_path = os.path.join(data_folder, file)
-        if os.path.isfile(file_path):
-            try:
-                # Пытаемся прочитать первые несколько строк
-                if file.endswith('.csv'):
-                    df = pd.read_csv(file_path, nrows=5)
-                    print(f"{file}: {len(df.columns)} колонок, пример данных: {list(df.columns)}")
-                else:
-                    print(f"{file}: не CSV файл")
-            except Exception as e:
-                print(f"{file}: ошибка чтения - {e}")
+        if not os.path.isfile(file_path):
+            continue
+        print(f"\n--- Анализ файла: {file} ---")
+        if not file.lower().endswith('.csv'):
+            print("Не CSV файл")
+            continue
+
+        try:
+            encoding = detect_encoding(file_path)
+        except OSError as e:
+            print(f"Не удалось проверить кодировку: {e}")
+            continue
+        if encoding is None:
+            print("Кодировка не определена (не UTF-8)")
+            continue
+        print(f"Кодировка: {'UTF-8 с BOM' if encoding == 'utf-8-sig' else 'UTF-8'}")
+
+        try:
+            header, head = read_head(file_path, rows, encoding)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            print(f"Ошибка чтения: {e}")
+            continue
+        print(f"Колонки ({len(header)}): {header}")
+        for row in head:
+            print("  " + ", ".join(row))
+
 
 if __name__ == "__main__":
-    analyze_data_folder('data')
\ No newline at end of file
+    analyze_data_folder('data')
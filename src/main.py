@@ -1,124 +1,188 @@
 import pandas as pd
-import numpy as np
 import os
-import glob
+import argparse
+from datetime import datetime
+import cProfile
+import pstats
+import data_cache
+from data_cache import DataCache
+from data_loader import DataLoader, filter_files, find_clients_file
 from data_processor import DataProcessor
-from product_recommender import ProductRecommender
-from push_generator import PushGenerator
+from config_snapshot import SNAPSHOT_NAME, load_components
+from pipeline import RecommendationPipeline, select_clients, output_columns
+from output_sinks import FORMATS, open_sink
+from send_history import SendHistory, DeltaSink
+from streaming import ShardedRunner
+from feature_state import FeatureState
+from metrics import metrics
+
+def parse_client_ids(value):
+    try:
+        return [int(code) for code in value.split(',') if code.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Ожидается список кодов через запятую: {value}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация персональных пуш-уведомлений")
+    parser.add_argument('--cache-dir', default='cache',
+                        help="Папка колоночного кэша транзакций и переводов")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Читать CSV напрямую, без кэша")
+    parser.add_argument('--limit', type=int,
+                        help="Обработать только первых N клиентов")
+    parser.add_argument('--client-ids', type=parse_client_ids,
+                        help="Обработать только клиентов с указанными кодами (через запятую)")
+    parser.add_argument('--output', default='output/recommendations.csv',
+                        help="Файл с результатами")
+    parser.add_argument('--format', choices=FORMATS,
+                        help="Формат результатов; по умолчанию по расширению --output (иначе CSV)")
+    parser.add_argument('--top-products', type=int, nargs='?', const=4, default=0, metavar='N',
+                        help="Добавить в результат топ-N продуктов со скорами (без N - топ-4)")
+    parser.add_argument('--send-history',
+                        help="Папка истории отправок: в результат попадают только новые и изменённые пуши "
+                             "с учётом лимитов из раздела delivery конфига")
+    parser.add_argument('--shard-size', type=int,
+                        help="Потоковый режим: обрабатывать клиентов шардами указанного размера")
+    parser.add_argument('--resume', action='store_true',
+                        help="Продолжить прерванный прогон с последнего завершённого шарда")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Число процессов; клиенты делятся между ними по шардам")
+    parser.add_argument('--feature-state',
+                        help="Брать признаки из состояния daily_update.py вместо разбора файлов")
+    parser.add_argument('--data-dir', default='data',
+                        help="Папка с clients.csv и файлами транзакций и переводов")
+    parser.add_argument('--metrics-log',
+                        help="Журнал метрик стадий в формате JSON Lines")
+    parser.add_argument('--metrics-file',
+                        help="Итоговые метрики в текстовом формате Prometheus")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Пик выделенной памяти по стадиям через tracemalloc (заметно замедляет прогон)")
+    parser.add_argument('--profile',
+                        help="Профиль cProfile горячего пути в указанный файл (.prof) и топ функций в консоль")
+    return parser.parse_args(argv)
+
+def load_clients(data_folder):
+    """Загрузка таблицы клиентов"""
+    return pd.read_csv(find_clients_file(data_folder))
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics_log or args.metrics_file or args.trace_memory:
+        metrics.configure(trace_memory=args.trace_memory, log_path=args.metrics_log)
+
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with metrics.stage('run'):
+            run(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"\nПрофиль сохранён в {args.profile}, топ функций по суммарному времени:")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+
+    if metrics.enabled:
+        metrics.log(dict({'event': 'summary'}, **metrics.summary()))
+        if args.metrics_file:
+            metrics.write_prometheus(args.metrics_file)
+
+def run(args):
+
+    config_path = 'config/product_config.json'
+    templates_path = 'templates/push_templates.json'
 
-def main():
     # Инициализация компонентов
     processor = DataProcessor()
-    recommender = ProductRecommender('config/product_config.json')
-    push_generator = PushGenerator('templates/push_templates.json')
-    
+    # Разобранный конфиг и шаблоны берутся из снимка в папке кэша
+    snapshot_path = None if args.no_cache else os.path.join(args.cache_dir, SNAPSHOT_NAME)
+    recommender, push_generator = load_components(config_path, templates_path, snapshot_path)
+    pipeline = RecommendationPipeline(processor, recommender, push_generator, top_n=args.top_products)
+
     # Загрузка данных
-    data_folder = 'data'
-    
-    # Загрузка клиентов
-    clients_path = os.path.join(data_folder, 'clients.csv')
-    if not os.path.exists(clients_path):
-        # Попробуем найти файл с другим регистром
-        client_files = glob.glob(os.path.join(data_folder, '*client*'))
-        if client_files:
-            clients_path = client_files[0]
-        else:
-            raise FileNotFoundError("Файл с клиентами не найден")
-    
-    clients = pd.read_csv(clients_path)
+    data_folder = args.data_dir
+
+    clients = load_clients(data_folder)
     print(f"Загружено клиентов: {len(clients)}")
-    
-    # Загрузка транзакций и переводов
-    all_files = os.listdir(data_folder)
-    
-    transactions_dfs = []
-    transfers_dfs = []
-    
-    for file in all_files:
-        if file.lower() == 'clients.csv' or 'client' in file.lower():
-            continue
-            
-        file_path = os.path.join(data_folder, file)
-        
-        try:
-            # Пробуем прочитать файл чтобы определить его тип
-            df_sample = pd.read_csv(file_path, nrows=5)
-            
-            # Определяем тип по колонкам
-            if 'category' in df_sample.columns:
-                df = pd.read_csv(file_path)
-                transactions_dfs.append(df)
-                print(f"Загружены транзакции из {file}: {len(df)} записей")
-            elif 'type' in df_sample.columns and 'direction' in df_sample.columns:
-                df = pd.read_csv(file_path)
-                transfers_dfs.append(df)
-                print(f"Загружены переводы из {file}: {len(df)} записей")
-                
-        except Exception as e:
-            print(f"Ошибка при чтении файла {file}: {e}")
-    
-    # Объединение данных
-    transactions = pd.concat(transactions_dfs, ignore_index=True) if transactions_dfs else pd.DataFrame()
-    transfers = pd.concat(transfers_dfs, ignore_index=True) if transfers_dfs else pd.DataFrame()
-    
-    print(f"Всего транзакций: {len(transactions)}")
-    print(f"Всего переводов: {len(transfers)}")
-    
-    # Предобработка данных
-    client_features = processor.preprocess_data(clients, transactions, transfers)
-    
-    # Генерация рекомендаций
-    recommendations = []
-    
-    for _, client in clients.iterrows():
-        client_code = client['client_code']
-        
-        # Находим данные клиента
-        client_data = client_features[client_features['client_code'] == client_code]
-        
-        if len(client_data) == 0:
-            print(f"Нет данных для клиента {client_code}")
-            # Используем резервную рекомендацию
-            best_product = "Премиальная карта"
-            push_text = push_generator.generate_push(
-                best_product, 
-                {},
-                client.to_dict()
-            )
-        else:
-            client_data = client_data.iloc[0]
-            
-            # Рекомендация продуктов
-            top_products = recommender.recommend_top_products(client_data.to_dict())
-            best_product = top_products[0] if top_products else "Премиальная карта"
-            
-            # Генерация пуш-уведомления
-            push_text = push_generator.generate_push(
-                best_product, 
-                client_data.to_dict(),
-                client.to_dict()
-            )
-        
-        recommendations.append({
-            'client_code': client_code,
-            'product': best_product,
-            'push_notification': push_text
-        })
-    
-    # Сохранение результатов с правильной кодировкой
-    results_df = pd.DataFrame(recommendations)
-    os.makedirs('output', exist_ok=True)
-    
-    # Сохраняем с UTF-8 кодировкой
-    results_df.to_csv('output/recommendations.csv', index=False, encoding='utf-8')
-    print("Результаты сохранены в output/recommendations.csv")
-    
-    print(f"\nСгенерировано {len(recommendations)} рекомендаций")
+
+    # Точечный перезапуск: только выбранные клиенты и только их файлы
+    targeted = args.limit is not None or args.client_ids
+    clients = select_clients(clients, args.limit, args.client_ids)
+    if targeted:
+        print(f"Выбрано клиентов: {len(clients)}")
+
+    loader = DataLoader()
+    # Со --feature-state признаки уже посчитаны, файлы данных не нужны
+    files = [] if args.feature_state else loader.scan(data_folder)
+    cache = None
+    # Без файлов данных кэш не нужен, а prune([]) удалил бы его целиком
+    if args.feature_state or args.no_cache or not data_cache.is_available():
+        load_files = loader.load_files
+    else:
+        cache = DataCache(args.cache_dir, loader)
+        cache.prune(files)
+        load_files = cache.load_files
+    if targeted:
+        files = filter_files(files, clients['client_code'].tolist())
+    print(f"Файлов данных: {len(files)}")
+
+    # Признаки, скоринг и пуши; в потоковом режиме - по шардам клиентов
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    shard_size = args.shard_size
+    worker_options = None
+    if args.workers > 1:
+        # Результаты воркеров сливаются по шардам, поэтому порядок - по client_code
+        clients = clients.sort_values('client_code', kind='stable').reset_index(drop=True)
+        if shard_size is None:
+            shard_size = max(1, -(-len(clients) // (args.workers * 4)))
+        if cache is not None:
+            # Кэш обновляется заранее, воркеры только читают его
+            cache.update_files(files)
+        worker_options = {
+            'config_path': config_path,
+            'templates_path': templates_path,
+            'top_n': args.top_products,
+            'cache_dir': args.cache_dir if cache is not None else None
+        }
+
+    feature_source = None
+    if args.feature_state:
+        if args.workers > 1:
+            raise SystemExit("--feature-state не поддерживается вместе с --workers")
+        state = FeatureState.load(args.feature_state, processor.feature_engine)
+        print(f"Признаки из состояния на {state.as_of}")
+        feature_source = lambda shard: state.features(shard).to_frame()
+
+    runner = ShardedRunner(pipeline, load_files, shard_size, args.workers, worker_options, feature_source)
+    output = open_sink(args.output, output_columns(args.top_products), args.format)
+    history = None
+    run_date = datetime.now()
+    if args.send_history:
+        history = SendHistory.from_config(args.send_history, recommender.config)
+        output = DeltaSink(output, history, run_date)
+    total = runner.run(clients, files, output, resume=args.resume, run_date=run_date)
+
+    if loader.errors:
+        print(f"Файлов с ошибками: {len(loader.errors)}")
+    print(f"Результаты сохранены в {args.output}")
+
+    # С историей отправок total - пуши после фильтра, подавленные выводятся отдельно
+    print(f"\nСгенерировано {total} рекомендаций")
+    if history is not None:
+        stats = history.stats
+        suppressed = stats['unchanged'] + stats['cooldown'] + stats['frequency_cap']
+        print(f"Подавлено историей отправок: {suppressed}; без изменений: {stats['unchanged']}, "
+              f"по паузе продукта: {stats['cooldown']}, по частотному лимиту: {stats['frequency_cap']}")
     print("Примеры рекомендаций:")
-    for i, rec in enumerate(recommendations[:5]):
+    for rec in runner.examples:
         print(f"\nКлиент {rec['client_code']}:")
         print(f"Продукт: {rec['product']}")
         print(f"Пуш: {rec['push_notification']}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+import tracemalloc
+from datetime import datetime
+
+PROMETHEUS_PREFIX = 'push_pipeline'
+
+
+class _NullStage:
+    """Заглушка стадии при выключенных метриках: вход и выход ничего не делают"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_rows(self, rows):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Замер одной стадии: время, строки и (опционально) пик памяти tracemalloc"""
+
+    def __init__(self, metrics, name, rows, log):
+        self.metrics = metrics
+        self.name = name
+        self.rows = rows
+        self.log = log
+
+    def add_rows(self, rows):
+        self.rows = (self.rows or 0) + rows
+
+    def __enter__(self):
+        if self.metrics.trace_memory:
+            self.metrics._memory_enter(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        memory = self.metrics._memory_exit(self) if self.metrics.trace_memory else None
+        self.metrics._record(self.name, elapsed, self.rows, memory, self.log)
+        return False
+
+
+class Metrics:
+    """Метрики прогона: время и строки по стадиям, пики памяти и счётчики событий.
+
+    По умолчанию выключены: stage() отдаёт общую заглушку, count() сразу
+    возвращается, поэтому инструментированный код почти ничего не теряет.
+    Включаются через configure(); итоги пишутся JSON-строками в журнал и
+    текстовым файлом в формате Prometheus.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.log_path = None
+        self._lock = threading.Lock()
+        self._memory_stack = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.counters = {}
+
+    def configure(self, enabled=True, trace_memory=False, log_path=None):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.log_path = log_path
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.reset()
+
+    def stage(self, name, rows=None, log=True):
+        """Контекст замера стадии; log=False - без строки в журнале на каждый вызов"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows, log)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _memory_enter(self, stage):
+        # Вложенные стадии сбрасывают пик, поэтому внешняя стадия забирает пики вложенных
+        stack = self._memory_stack.__dict__.setdefault('frames', [])
+        stage.memory_start = tracemalloc.get_traced_memory()[0]
+        stage.memory_peak = 0
+        if stack:
+            stack[-1].memory_peak = max(stack[-1].memory_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        stack.append(stage)
+
+    def _memory_exit(self, stage):
+        stack = self._memory_stack.frames
+        stack.pop()
+        peak = max(stage.memory_peak, tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1].memory_peak = max(stack[-1].memory_peak, peak)
+        return max(0, peak - stage.memory_start)
+
+    def _record(self, name, elapsed, rows, memory, log):
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = {'calls': 0, 'seconds': 0.0, 'rows': 0}
+            stats['calls'] += 1
+            stats['seconds'] += elapsed
+            if rows is not None:
+                stats['rows'] += rows
+            if memory is not None:
+                stats['memory_peak_bytes'] = max(stats.get('memory_peak_bytes', 0), memory)
+        if log and self.log_path:
+            event = {'event': 'stage', 'stage': name, 'seconds': round(elapsed, 6)}
+            if rows is not None:
+                event['rows'] = rows
+                event['rows_per_second'] = round(rows / elapsed, 1) if elapsed > 0 else None
+            if memory is not None:
+                event['memory_peak_bytes'] = memory
+            self.log(event)
+
+    def log(self, event):
+        """Строка структурированного журнала (JSON Lines)"""
+        if not self.log_path:
+            return
+        line = json.dumps(dict({'ts': datetime.now().isoformat(timespec='milliseconds')}, **event),
+                          ensure_ascii=False)
+        with self._lock, open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+    def summary(self):
+        stages = {}
+        for name, stats in self.stages.items():
+            stats = dict(stats, seconds=round(stats['seconds'], 6))
+            if stats['rows'] and stats['seconds'] > 0:
+                stats['rows_per_second'] = round(stats['rows'] / stats['seconds'], 1)
+            stages[name] = stats
+        return {'stages': stages, 'counters': dict(self.counters)}
+
+    def write_prometheus(self, path):
+        """Метрики в текстовом формате Prometheus (для node_exporter textfile); запись атомарная"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            if not samples:
+                return
+            lines.append(f'# HELP {PROMETHEUS_PREFIX}_{name} {help_text}')
+            lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{PROMETHEUS_PREFIX}_{name}{labels} {value:g}')
+
+        stages = sorted(self.stages.items())
+        label = lambda name: '{stage="%s"}' % name
+        metric('stage_seconds_total', 'counter', 'Wall time spent in the stage',
+               [(label(name), stats['seconds']) for name, stats in stages])
+        metric('stage_calls_total', 'counter', 'Number of times the stage ran',
+               [(label(name), stats['calls']) for name, stats in stages])
+        metric('stage_rows_total', 'counter', 'Rows processed by the stage',
+               [(label(name), stats['rows']) for name, stats in stages if stats['rows']])
+        metric('stage_memory_peak_bytes', 'gauge', 'Peak traced memory allocated during the stage',
+               [(label(name), stats['memory_peak_bytes']) for name, stats in stages
+                if 'memory_peak_bytes' in stats])
+        for name, value in sorted(self.counters.items()):
+            metric(f'{name}_total', 'counter', f'Count of {name.replace("_", " ")} events', [('', value)])
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+
+# Общий реестр процесса; компоненты пишут в него, main.py включает и выгружает
+metrics = Metrics()
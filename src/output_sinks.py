@@ -0,0 +1,229 @@
+import os
+import io
+import json
+import shutil
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Строк в буфере до записи на диск; контрольная точка сбрасывает буфер раньше
+BUFFER_ROWS = 50000
+
+
+class OutputSink:
+    """Потоковая запись рекомендаций в <path>.part с атомарной подменой в конце.
+
+    Блоки копятся в буфере и кодируются одним куском по buffer_rows строк.
+    checkpoint() сбрасывает буфер на диск (с fsync) и возвращает смещение,
+    с которого ShardedRunner продолжает прерванный прогон: begin(offset)
+    отрезает всё, что записано после этой контрольной точки.
+    """
+
+    format = None
+
+    def __init__(self, path, columns, buffer_rows=BUFFER_ROWS):
+        self.path = path
+        self.part_path = path + '.part'
+        self.columns = list(columns)
+        self.buffer_rows = buffer_rows
+        self._buffer = []
+        self._buffered = 0
+
+    @property
+    def signature(self):
+        """Формат и колонки: прогресс другого вида вывода не возобновляется"""
+        return f"{self.format}:{','.join(self.columns)}"
+
+    def begin(self, offset=None):
+        raise NotImplementedError
+
+    def write(self, chunk):
+        """Блок в буфер вывода; возвращает число записанных строк"""
+        if not len(chunk):
+            return 0
+        self._buffer.append(chunk)
+        self._buffered += len(chunk)
+        if self._buffered >= self.buffer_rows:
+            self.flush()
+        return len(chunk)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        chunk = self._buffer[0] if len(self._buffer) == 1 else pd.concat(self._buffer, ignore_index=True)
+        self._buffer, self._buffered = [], 0
+        self._write_block(chunk)
+
+    def _write_block(self, chunk):
+        raise NotImplementedError
+
+    def checkpoint(self):
+        raise NotImplementedError
+
+    def commit(self):
+        """Финальный сброс и подмена результата готовым файлом"""
+        self.checkpoint()
+        self.close()
+        os.replace(self.part_path, self.path)
+
+    def close(self):
+        pass
+
+
+class _TextSink(OutputSink):
+    """Текстовый вывод в один файл; смещение контрольной точки - длина файла в байтах"""
+
+    def __init__(self, path, columns, buffer_rows=BUFFER_ROWS):
+        super().__init__(path, columns, buffer_rows)
+        self._file = None
+
+    def begin(self, offset=None):
+        if offset is None:
+            self._file = open(self.part_path, 'wb')
+            self._file.write(self._header())
+        else:
+            self._file = open(self.part_path, 'r+b')
+            self._file.truncate(offset)
+            self._file.seek(offset)
+
+    def _header(self):
+        return b''
+
+    def _write_block(self, chunk):
+        self._file.write(self._encode(chunk))
+
+    def checkpoint(self):
+        self.flush()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CsvSink(_TextSink):
+    """CSV с теми же колонками и форматированием, что и прежний to_csv"""
+
+    format = 'csv'
+
+    def _header(self):
+        return (','.join(self.columns) + '\n').encode('utf-8')
+
+    def _encode(self, chunk):
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, index=False, header=False, columns=self.columns)
+        return buffer.getvalue().encode('utf-8')
+
+
+class JsonlSink(_TextSink):
+    """JSON Lines: объект на строку; топ продуктов - списком {product, score}, как в service.py"""
+
+    format = 'jsonl'
+
+    def _encode(self, chunk):
+        top_n = sum(1 for name in self.columns if name.startswith('top_product_'))
+        base = [name for name in self.columns if not name.startswith('top_')]
+        columns = {name: chunk[name].tolist() for name in self.columns}
+        lines = []
+        for i in range(len(chunk)):
+            record = {name: columns[name][i] for name in base}
+            if top_n:
+                record['top_products'] = [
+                    {'product': columns[f'top_product_{k}'][i], 'score': columns[f'top_score_{k}'][i]}
+                    for k in range(1, top_n + 1) if columns[f'top_product_{k}'][i] is not None
+                ]
+            lines.append(json.dumps(record, ensure_ascii=False))
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class ParquetSink(OutputSink):
+    """Parquet: контрольная точка - отдельный файл в папке <path>.part.
+
+    Parquet нельзя дописать после обрыва (метаданные в конце файла),
+    поэтому до завершения прогона блоки лежат файлами part-NNNNN.parquet,
+    а смещение - число готовых файлов. commit() склеивает их группами
+    строк в один файл, не поднимая в память весь результат.
+    """
+
+    format = 'parquet'
+
+    def __init__(self, path, columns, buffer_rows=BUFFER_ROWS):
+        if pa is None:
+            raise ImportError("Для вывода в Parquet нужен pyarrow")
+        super().__init__(path, columns, buffer_rows)
+        self._parts = 0
+        # Явная схема: пустой хвост топа в одном блоке не должен давать тип null
+        self.schema = pa.schema([(name, self._column_type(name)) for name in self.columns])
+
+    @staticmethod
+    def _column_type(name):
+        if name == 'client_code':
+            return pa.int64()
+        if name.startswith('top_score_'):
+            return pa.float64()
+        return pa.string()
+
+    def _part_file(self, index):
+        return os.path.join(self.part_path, f'part-{index:05d}.parquet')
+
+    def begin(self, offset=None):
+        if offset is None:
+            shutil.rmtree(self.part_path, ignore_errors=True)
+            os.makedirs(self.part_path)
+            self._parts = 0
+            return
+        self._parts = offset
+        for name in os.listdir(self.part_path):
+            if not name.startswith('part-') or int(name[5:10]) >= offset:
+                os.remove(os.path.join(self.part_path, name))
+
+    def _table(self, chunk):
+        return pa.Table.from_pandas(chunk[self.columns], schema=self.schema, preserve_index=False)
+
+    def _write_block(self, chunk):
+        path = self._part_file(self._parts)
+        pq.write_table(self._table(chunk), path + '.tmp')
+        os.replace(path + '.tmp', path)
+        self._parts += 1
+
+    def checkpoint(self):
+        self.flush()
+        return self._parts
+
+    def commit(self):
+        self.checkpoint()
+        tmp_path = self.path + '.tmp'
+        with pq.ParquetWriter(tmp_path, self.schema) as writer:
+            for index in range(self._parts):
+                writer.write_table(pq.read_table(self._part_file(index), schema=self.schema))
+        os.replace(tmp_path, self.path)
+        shutil.rmtree(self.part_path)
+
+
+SINKS = {'csv': CsvSink, 'parquet': ParquetSink, 'jsonl': JsonlSink}
+FORMATS = tuple(SINKS)
+
+
+def detect_format(path):
+    """Формат по расширению файла; по умолчанию CSV"""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('parquet', 'pq'):
+        return 'parquet'
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    return 'csv'
+
+
+def open_sink(path, columns, format=None, buffer_rows=BUFFER_ROWS):
+    """Вывод нужного формата; format=None - по расширению path"""
+    format = format or detect_format(path)
+    if format not in SINKS:
+        raise ValueError(f"Неизвестный формат вывода: {format}")
+    return SINKS[format](path, columns, buffer_rows)
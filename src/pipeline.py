@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from metrics import metrics
+
+DEFAULT_PRODUCT = "Премиальная карта"
+OUTPUT_COLUMNS = ['client_code', 'product', 'push_notification']
+
+
+def top_columns(top_n):
+    """Колонки топ-N продуктов и их скоров: top_product_1, top_score_1, ..."""
+    return [f'top_{field}_{k}' for k in range(1, top_n + 1) for field in ('product', 'score')]
+
+
+def output_columns(top_n=0):
+    return OUTPUT_COLUMNS + top_columns(top_n)
+
+
+def select_clients(clients, limit=None, client_ids=None):
+    """Отбор клиентов для точечного перезапуска: по списку кодов и/или первые N"""
+    if client_ids:
+        clients = clients[clients['client_code'].isin(client_ids)]
+    if limit is not None:
+        clients = clients.head(limit)
+    return clients.reset_index(drop=True)
+
+
+class RecommendationPipeline:
+    """Пакетный расчёт рекомендаций: признаки -> скоринг -> пуши.
+
+    Признаки строятся в порядке строк clients, поэтому клиенты, признаки
+    и результаты совмещаются по позиции без поиска по client_code.
+    """
+
+    def __init__(self, processor, recommender, push_generator, chunk_size=100000, top_n=0):
+        self.processor = processor
+        self.recommender = recommender
+        self.push_generator = push_generator
+        self.chunk_size = chunk_size
+        # top_n > 0 - в результат добавляются топ-N продуктов со скорами
+        self.top_n = top_n
+
+    def build_features(self, clients, transactions, transfers):
+        features = self.processor.preprocess_data(clients, transactions, transfers)
+        if not np.array_equal(features['client_code'].to_numpy(), clients['client_code'].to_numpy()):
+            raise ValueError("Порядок признаков не совпадает с порядком клиентов")
+        return features
+
+    def recommend_chunk(self, clients, features, run_date=None):
+        """Рекомендации для блока клиентов с совмещёнными по позиции признаками"""
+        product_names = np.array(self.recommender.product_names + [DEFAULT_PRODUCT], dtype=object)
+        with metrics.stage('scoring', rows=len(features)):
+            if self.recommender.product_names:
+                scores = self.recommender.score_batch(features)
+                top = self.recommender.top_products_batch(scores, max(self.top_n, 1))
+            else:
+                scores = np.zeros((len(features), 1))
+                top = np.full((len(features), 1), len(product_names) - 1)
+            products = product_names[top[:, 0]]
+
+        with metrics.stage('rendering', rows=len(features)):
+            push_texts = self.push_generator.generate_batch(products, features, clients, run_date=run_date)
+        result = pd.DataFrame({
+            'client_code': clients['client_code'].to_numpy(),
+            'product': products,
+            'push_notification': push_texts
+        }, columns=OUTPUT_COLUMNS)
+        if self.top_n:
+            self._add_top_products(result, product_names, scores, top)
+        return result
+
+    def _add_top_products(self, result, product_names, scores, top):
+        """Топ-N продуктов со скорами; если продуктов меньше N, хвост пустой"""
+        top_scores = np.take_along_axis(scores, np.minimum(top, scores.shape[1] - 1), axis=1)
+        for k in range(self.top_n):
+            if k < top.shape[1]:
+                result[f'top_product_{k + 1}'] = product_names[top[:, k]]
+                result[f'top_score_{k + 1}'] = top_scores[:, k]
+            else:
+                result[f'top_product_{k + 1}'] = None
+                result[f'top_score_{k + 1}'] = np.nan
+
+    def iter_recommendations(self, clients, features, run_date=None):
+        """Рекомендации блоками по chunk_size клиентов"""
+        for start in range(0, len(clients), self.chunk_size):
+            stop = start + self.chunk_size
+            yield self.recommend_chunk(clients.iloc[start:stop], features.iloc[start:stop], run_date)
+
+    def recommend(self, clients, transactions, transfers, run_date=None):
+        """Все рекомендации одним DataFrame"""
+        clients = clients.reset_index(drop=True)
+        features = self.build_features(clients, transactions, transfers)
+        chunks = list(self.iter_recommendations(clients, features, run_date))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=output_columns(self.top_n))
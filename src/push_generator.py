@@ -1,6 +1,61 @@
 import json
-import random
+import zlib
+from string import Formatter
 from datetime import datetime
+import numpy as np
+from metrics import metrics
+
+# Ограничения Tone of Voice на длину пуша
+MAX_PUSH_LENGTH = 220
+TRUNCATED_LENGTH = 180
+
+# Плейсхолдеры шаблонов, которые берутся из признаков клиента
+FEATURE_PARAMS = {
+    'cat1': 'top_category_1',
+    'cat2': 'top_category_2',
+    'cat3': 'top_category_3',
+    'fx_curr': 'fx_currency'
+}
+
+
+def _is_missing(value):
+    return value is None or value != value
+
+
+class CompiledTemplate:
+    """Шаблон, разобранный один раз: литералы и нужные плейсхолдеры"""
+    
+    def __init__(self, template):
+        self.template = template
+        self.parts = list(Formatter().parse(template)) if template else []
+        self.fields = []
+        for _, field_name, _, _ in self.parts:
+            if field_name is not None and field_name not in self.fields:
+                self.fields.append(field_name)
+        self.literal_length = sum(len(literal) for literal, _, _, _ in self.parts)
+        # Простые {name} без спецификаторов склеиваются напрямую, остальное - через format
+        self.simple = all(
+            field_name is None or (field_name.isidentifier() and not format_spec and not conversion)
+            for _, field_name, format_spec, conversion in self.parts
+        )
+    
+    def render(self, params):
+        """Рендер одного сообщения; KeyError при отсутствии параметра"""
+        return self.template.format(**params)
+    
+    def render_columns(self, columns, n):
+        """Рендер n сообщений по колонкам параметров (object-массивы строк)"""
+        if not self.simple:
+            return [self.template.format(**{field: columns[field][i] for field in self.fields})
+                    for i in range(n)]
+        
+        result = np.full(n, '', dtype=object)
+        for literal, field_name, _, _ in self.parts:
+            if literal:
+                result = result + literal
+            if field_name is not None:
+                result = result + columns[field_name]
+        return list(result)
 
 class PushGenerator:
     def __init__(self, templates_path):
@@ -10,6 +65,11 @@ class PushGenerator:
         except:
             self.templates = self._create_default_templates()
         
+        self.renderers = {
+            product_name: CompiledTemplate(template_info.get('template', ''))
+            for product_name, template_info in self.templates.items()
+        }
+        
         self.month_names = {
             1: "январе", 2: "феврале", 3: "марте", 4: "апреле",
             5: "мае", 6: "июне", 7: "июле", 8: "августе",
@@ -30,53 +90,150 @@ class PushGenerator:
             }
         }
     
-    def generate_push(self, product_name, client_data, client_profile):
+    def _month_name(self, run_date=None):
+        return self.month_names.get((run_date or datetime.now()).month, 'этом месяце')
+    
+    def generate_push(self, product_name, client_data, client_profile, run_date=None):
         """Генерация персонализированного пуш-уведомления"""
-        template_info = self.templates.get(product_name, {})
-        template = template_info.get('template', '')
+        renderer = self.renderers.get(product_name)
         
-        if not template:
-            return self._generate_fallback_push(product_name, client_profile.get('name', 'Клиент'))
+        if renderer is None or not renderer.template:
+            metrics.count('push_fallback')
+            return self._generate_fallback_push(product_name, client_profile.get('name', 'Клиент'),
+                                                client_profile.get('client_code'))
         
         # Подготовка параметров для шаблона
         params = {
             'name': client_profile.get('name', 'Клиент'),
-            'month': self.month_names.get(datetime.now().month, 'этом месяце')
+            'month': self._month_name(run_date)
         }
+        for field in renderer.fields:
+            column = FEATURE_PARAMS.get(field)
+            if column is not None and not _is_missing(client_data.get(column)):
+                params[field] = client_data[column]
         
         # Генерация текста
         try:
-            push_text = template.format(**params)
+            push_text = renderer.render(params)
         except:
-            push_text = self._generate_fallback_push(product_name, client_profile.get('name', 'Клиент'))
+            metrics.count('template_format_failures')
+            metrics.count('push_fallback')
+            push_text = self._generate_fallback_push(product_name, client_profile.get('name', 'Клиент'),
+                                                     client_profile.get('client_code'))
         
         # Применение TOV правил
         push_text = self._apply_tov_rules(push_text)
         
         return push_text
     
+    @staticmethod
+    def _as_text(values, keep_missing=False):
+        """Значения колонки как строки, в точности как их подставил бы str.format.
+        
+        С keep_missing=True пропуски (NaN/None) остаются None.
+        """
+        if keep_missing:
+            return np.array([value if isinstance(value, str) else None if _is_missing(value) else format(value)
+                             for value in values], dtype=object)
+        return np.array([value if isinstance(value, str) else format(value) for value in values], dtype=object)
+    
+    def _feature_text(self, features, column):
+        """Колонка признака как строки; категориальные колонки переводятся без цикла по строкам"""
+        if features is None or column not in features:
+            return None
+        values = features[column]
+        if hasattr(values, 'cat'):
+            categories = np.append(self._as_text(values.cat.categories.to_numpy()), None)
+            return categories[values.cat.codes.to_numpy()]
+        return self._as_text(values.to_numpy(), keep_missing=True)
+    
+    def generate_batch(self, products, features, profiles, run_date=None):
+        """Пакетная генерация пушей: рендер по колонкам для каждого шаблона.
+        
+        products - название продукта для каждого клиента, features и profiles -
+        DataFrame признаков и профилей в том же порядке строк.
+        """
+        products = np.asarray(products, dtype=object)
+        n = len(products)
+        month = self._month_name(run_date)
+        names = (self._as_text(profiles['name'].to_numpy()) if 'name' in profiles
+                 else np.full(n, 'Клиент', dtype=object))
+        codes = profiles['client_code'].tolist() if 'client_code' in profiles else [None] * n
+        available = {'name': names, 'month': np.full(n, month, dtype=object)}
+        for field, column in FEATURE_PARAMS.items():
+            values = self._feature_text(features, column)
+            if values is not None:
+                available[field] = values
+        
+        result = np.empty(n, dtype=object)
+        for product_name in dict.fromkeys(products):
+            rows = np.flatnonzero(products == product_name)
+            renderer = self.renderers.get(product_name)
+            
+            if renderer is None or not renderer.template:
+                metrics.count('push_fallback', len(rows))
+                result[rows] = [self._generate_fallback_push(product_name, names[i], codes[i]) for i in rows]
+                continue
+            
+            if any(field not in available for field in renderer.fields):
+                missing = np.ones(len(rows), dtype=bool)
+            else:
+                missing = np.zeros(len(rows), dtype=bool)
+                for field in renderer.fields:
+                    missing |= available[field][rows] == None
+            
+            # Клиенты без нужного параметра получают резервный текст, как при ошибке format
+            fallback_rows = rows[missing]
+            if len(fallback_rows):
+                metrics.count('template_format_failures', len(fallback_rows))
+                metrics.count('push_fallback', len(fallback_rows))
+            result[fallback_rows] = [self._apply_tov_rules(self._generate_fallback_push(product_name, names[i], codes[i]))
+                                     for i in fallback_rows]
+            rows = rows[~missing]
+            if not len(rows):
+                continue
+            
+            columns = {field: available[field][rows] for field in renderer.fields}
+            texts = renderer.render_columns(columns, len(rows))
+            
+            # Проверка длины нужна только если верхняя оценка длины превышает лимит
+            max_length = renderer.literal_length + sum(
+                max(map(len, values), default=0) for values in columns.values())
+            if not renderer.simple or max_length > MAX_PUSH_LENGTH:
+                texts = [self._apply_tov_rules(text) for text in texts]
+            result[rows] = texts
+        
+        return list(result)
+    
     def _apply_tov_rules(self, text):
         """Применение правил Tone of Voice"""
         # Убедимся, что текст не слишком длинный
-        if len(text) > 220:
-            words = text.split()
-            # Сохраняем первые 180 символов
-            truncated = ''
-            for word in words:
-                if len(truncated + ' ' + word) <= 180:
-                    truncated += ' ' + word
+        if len(text) > MAX_PUSH_LENGTH:
+            # Сохраняем первые 180 символов по целым словам
+            kept = []
+            length = 0
+            for word in text.split():
+                if length + 1 + len(word) <= TRUNCATED_LENGTH:
+                    kept.append(word)
+                    length += 1 + len(word)
                 else:
                     break
-            text = truncated.strip() + '...'
+            text = ' '.join(kept) + '...'
         
         return text
     
-    def _generate_fallback_push(self, product_name, client_name):
-        """Резервный шаблон для неизвестных продуктов"""
+    def _generate_fallback_push(self, product_name, client_name, client_code=None):
+        """Резервный шаблон для неизвестных продуктов.
+        
+        Вариант выбирается по client_code (без него - по имени), а не
+        случайно: повторный прогон даёт тот же текст, и история отправок
+        не принимает неизменившийся пуш за новый.
+        """
         templates = [
             f"{client_name}, у нас есть специальное предложение по {product_name.lower()}. Посмотреть детали?",
             f"{client_name}, подобрали для вас выгодный вариант — {product_name.lower()}. Оформить сейчас?",
             f"{client_name}, персональное предложение: {product_name.lower()} с преимуществами для вас. Узнать больше?"
         ]
         
-        return random.choice(templates)
\ No newline at end of file
+        seed = client_code if client_code is not None else zlib.crc32(str(client_name).encode('utf-8'))
+        return templates[int(seed) % len(templates)]
\ No newline at end of file
@@ -0,0 +1,263 @@
+import marshal
+import numpy as np
+
+
+class RuleError(ValueError):
+    """Ошибка в описании правила скоринга"""
+
+
+def top_indices(values, n):
+    """Индексы n наибольших значений в каждой строке [n_rows, k].
+
+    По убыванию значения, при равенстве - в порядке колонок, как stable
+    sorted(). Единственная реализация топа для признаков и правил.
+    """
+    k = min(n, values.shape[1])
+    if k == 0:
+        return np.empty((len(values), 0), dtype=np.intp)
+    if k < values.shape[1]:
+        candidates = np.argpartition(-values, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(k), (len(values), 1))
+
+    top_values = np.take_along_axis(values, candidates, axis=1)
+    order = np.lexsort((candidates, -top_values), axis=1)
+    top = np.take_along_axis(candidates, order, axis=1)
+
+    # argpartition не стабилен: если равные значения выходят за границу топа,
+    # строка пересчитывается стабильной сортировкой
+    threshold = np.take_along_axis(values, top[:, -1:], axis=1)
+    ties = (values == threshold).sum(axis=1) != (np.take_along_axis(values, top, axis=1) == threshold).sum(axis=1)
+    if ties.any():
+        top[ties] = np.argsort(-values[ties], axis=1, kind='stable')[:, :k]
+    return top
+
+
+def _top_sum_vector(columns, n):
+    """Сумма n наибольших значений по строкам, по убыванию, как sum(sorted(...))"""
+    values = np.column_stack(columns)
+    top = np.take_along_axis(values, top_indices(values, n), axis=1)
+    total = np.zeros(len(values))
+    for j in range(top.shape[1]):
+        total = total + top[:, j]
+    return total
+
+
+def _top_sum_scalar(columns, n):
+    return sum(sorted(columns, reverse=True)[:n])
+
+
+def _div_vector(a, b):
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    return np.divide(a, b, out=np.zeros(a.shape), where=b != 0)
+
+
+def _div_scalar(a, b):
+    return a / b if b != 0 else 0.0
+
+
+def _bool_vector(value):
+    return np.asarray(value, dtype=bool)
+
+
+# Правило компилируется в два варианта исходного кода: векторный (массивы
+# NumPy по всем клиентам) и скалярный (один клиент). Условия и логика в
+# скалярном - обычные if/else, and/or, чтобы ветка вычислялась только при
+# выполненном условии, как в написанном вручную коде
+VECTOR_NAMESPACE = {
+    '_min': np.minimum,
+    '_max': np.maximum,
+    '_where': np.where,
+    '_not': np.logical_not,
+    '_bool': _bool_vector,
+    '_div': _div_vector,
+    '_top_sum': _top_sum_vector,
+}
+
+SCALAR_NAMESPACE = {
+    '_min': min,
+    '_max': max,
+    '_not': lambda value: not value,
+    '_bool': bool,
+    '_div': _div_scalar,
+    '_top_sum': _top_sum_scalar,
+}
+
+COMPARISONS = {'gt': '>', 'ge': '>=', 'lt': '<', 'le': '<=', 'eq': '==', 'ne': '!='}
+
+
+class CompiledRule:
+    """Правило продукта, скомпилированное в функцию от признаков"""
+
+    def __init__(self, product_name, source, scalar_source, columns, codes=None):
+        self.product_name = product_name
+        self.source = source
+        self.scalar_source = scalar_source
+        self.columns = columns
+        self._codes = codes or (compile(source, f'<rule {product_name}>', 'exec'),
+                                compile(scalar_source, f'<scalar rule {product_name}>', 'exec'))
+
+        vector_namespace = dict(VECTOR_NAMESPACE)
+        exec(self._codes[0], vector_namespace)
+        self._vector = vector_namespace['rule']
+
+        scalar_namespace = dict(SCALAR_NAMESPACE)
+        exec(self._codes[1], scalar_namespace)
+        self._scalar = scalar_namespace['rule']
+
+    def __reduce__(self):
+        # Функции правила не сериализуются; в снимок идёт байткод, без повторной компиляции
+        return _restore_rule, (self.product_name, self.source, self.scalar_source, self.columns,
+                               marshal.dumps(self._codes))
+
+    def evaluate(self, client_data):
+        """Скор одного клиента (dict или Series признаков)"""
+        return self._scalar(*[client_data.get(col, 0) for col in self.columns])
+
+    def evaluate_batch(self, column, n):
+        """Скоры n клиентов; column(name) возвращает массив признака"""
+        # np.where вычисляет обе ветки: невыбранная ветка не должна давать предупреждений
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = self._vector(*[column(col) for col in self.columns])
+        return np.broadcast_to(np.asarray(result, dtype=np.float64), (n,))
+
+
+def _restore_rule(product_name, source, scalar_source, columns, codes):
+    return CompiledRule(product_name, source, scalar_source, columns, marshal.loads(codes))
+
+
+class RuleCompiler:
+    """Компиляция декларативных правил из product_config.json.
+
+    Правило продукта: {"when": <условие>, "score": <выражение>}. Выражения:
+    число; имя признака; "$параметр" из конфига продукта; "@группа" из
+    "feature_groups"; {"sum"|"mul"|"min"|"max": [...]}; {"sub"|"div": [a, b]};
+    {"weighted_sum": {признак: вес}}; div на ноль даёт 0; {"gt"|"ge"|"lt"|"le"|"eq"|"ne": [a, b]};
+    {"and"|"or": [...]}; {"not": e}; {"if": c, "then": a, "else": b};
+    {"top_sum": {"columns": "@группа", "n": 3}}.
+    """
+
+    def __init__(self, feature_groups=None):
+        self.feature_groups = feature_groups or {}
+
+    def compile_product(self, product_name, product_config):
+        rule = product_config.get('rule')
+        if rule is None:
+            source = 'def rule():\n    return 0\n'
+            return CompiledRule(product_name, source, source, [])
+
+        self._params = product_config
+        self._product_name = product_name
+        source, columns = self._source(rule, vector=True)
+        scalar_source, _ = self._source(rule, vector=False)
+        return CompiledRule(product_name, source, scalar_source, columns)
+
+    def _source(self, rule, vector):
+        """Исходный код функции правила и список её колонок-аргументов"""
+        self._columns = []
+        self._vectorized = vector
+        score = self._expr(rule.get('score', 0))
+        if 'when' in rule:
+            score = self._where(self._expr(rule['when']), score, '0')
+        body = f'_max({score}, 0)'
+
+        args = ', '.join(f'_c{i}' for i in range(len(self._columns)))
+        return f'def rule({args}):\n    return {body}\n', list(self._columns)
+
+    def compile_products(self, products):
+        """Словарь имя продукта -> CompiledRule"""
+        return {name: self.compile_product(name, config) for name, config in products.items()}
+
+    def _where(self, condition, then, otherwise):
+        if self._vectorized:
+            return f'_where({condition}, {then}, {otherwise})'
+        return f'(({then}) if ({condition}) else ({otherwise}))'
+
+    def _error(self, message):
+        return RuleError(f"Продукт '{self._product_name}': {message}")
+
+    def _column(self, name):
+        if name not in self._columns:
+            self._columns.append(name)
+        return f'_c{self._columns.index(name)}'
+
+    def _group(self, name):
+        group = self.feature_groups.get(name[1:])
+        if group is None:
+            raise self._error(f"неизвестная группа признаков {name}")
+        return [self._column(col) for col in group]
+
+    def _args(self, args, count=None):
+        if not isinstance(args, list) or not args or (count is not None and len(args) != count):
+            expected = f"{count} аргумента" if count else "непустой список"
+            raise self._error(f"ожидается {expected}, получено {args!r}")
+        return [self._expr(arg) for arg in args]
+
+    def _expr(self, node):
+        if isinstance(node, bool):
+            return repr(node)
+        if isinstance(node, (int, float)):
+            return repr(node)
+        if isinstance(node, str):
+            if node.startswith('$'):
+                value = self._params.get(node[1:])
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    raise self._error(f"параметр {node} не задан или не число")
+                return repr(value)
+            if node.startswith('@'):
+                raise self._error(f"группа {node} допустима только в top_sum")
+            return self._column(node)
+        if not isinstance(node, dict) or not node:
+            raise self._error(f"некорректное выражение {node!r}")
+
+        if 'if' in node:
+            condition = self._expr(node['if'])
+            then = self._expr(node.get('then', 0))
+            otherwise = self._expr(node.get('else', 0))
+            return self._where(condition, then, otherwise)
+
+        if len(node) != 1:
+            raise self._error(f"выражение должно содержать один оператор: {node!r}")
+        op, args = next(iter(node.items()))
+
+        if op == 'sum':
+            return '(' + ' + '.join(self._args(args)) + ')'
+        if op == 'mul':
+            return '(' + ' * '.join(self._args(args)) + ')'
+        if op == 'sub':
+            a, b = self._args(args, 2)
+            return f'({a} - {b})'
+        if op == 'div':
+            a, b = self._args(args, 2)
+            # Деление на ноль даёт 0 в обоих вариантах правила
+            return f'_div({a}, {b})'
+        if op in ('min', 'max'):
+            parts = self._args(args)
+            result = parts[0]
+            for part in parts[1:]:
+                result = f'_{op}({result}, {part})'
+            return result
+        if op == 'weighted_sum':
+            if not isinstance(args, dict) or not args:
+                raise self._error(f"weighted_sum ожидает словарь признак -> вес: {args!r}")
+            terms = [f'{self._expr(col)} * {self._expr(weight)}' for col, weight in args.items()]
+            return '(' + ' + '.join(terms) + ')'
+        if op in COMPARISONS:
+            a, b = self._args(args, 2)
+            return f'({a} {COMPARISONS[op]} {b})'
+        if op in ('and', 'or'):
+            parts = self._args(args)
+            if self._vectorized:
+                joiner = ' & ' if op == 'and' else ' | '
+                return '(' + joiner.join(f'_bool({part})' for part in parts) + ')'
+            return '_bool(' + f' {op} '.join(f'({part})' for part in parts) + ')'
+        if op == 'not':
+            return f'_not({self._expr(args)})'
+        if op == 'top_sum':
+            if not isinstance(args, dict) or not str(args.get('columns', '')).startswith('@'):
+                raise self._error(f"top_sum ожидает {{'columns': '@группа', 'n': N}}: {args!r}")
+            columns = self._group(args['columns'])
+            n = args.get('n', 3)
+            return f"_top_sum(({', '.join(columns)},), {int(n)})"
+
+        raise self._error(f"неизвестный оператор {op}")
@@ -0,0 +1,266 @@
+import os
+import json
+import shutil
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from metrics import metrics
+
+HISTORY_VERSION = 1
+DAY_SECONDS = 24 * 3600
+# Ключ записи - client_code * PRODUCT_SLOTS + номер продукта в словаре истории
+PRODUCT_SLOTS = 1024
+SUPPRESS_REASONS = ('unchanged', 'cooldown', 'frequency_cap')
+ARRAYS = ('latest_key', 'latest_hash', 'latest_sent', 'sends_code', 'sends_at')
+
+
+def content_hashes(chunk):
+    """64-битные хэши пары (продукт, текст пуша) для всего блока разом"""
+    hashes = pd.util.hash_pandas_object(chunk[['product', 'push_notification']], index=False)
+    return hashes.to_numpy().view(np.int64)
+
+
+def _align(keys, values, lookup):
+    """Найден ли ключ в отсортированном keys и значение values для него (иначе 0)"""
+    positions = np.searchsorted(keys, lookup)
+    found = positions < len(keys)
+    found[found] = keys[positions[found]] == lookup[found]
+    result = np.zeros(len(lookup), dtype=np.int64)
+    result[found] = values[positions[found]]
+    return found, result
+
+
+def _concat(parts, index):
+    if not parts:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate([part[index] for part in parts])
+
+
+class SendHistory:
+    """История отправленных пушей для выдачи только изменений.
+
+    Хранится в папке отсортированными массивами numpy, открытыми через
+    mmap: latest - последний отправленный пуш по (client_code, продукт) с
+    хэшем содержимого и временем, sends - отправки за окно частотного
+    лимита. Блок рекомендаций проверяется целиком через searchsorted, без
+    запроса на каждого клиента. Пуш подавляется, если он не изменился,
+    если тот же продукт отправлялся раньше cooldown_days или у клиента
+    исчерпан лимит отправок за окно.
+
+    Принятые пуши попадают в историю только в commit_run(), когда файл
+    результата уже готов: новое поколение массивов пишется рядом, и
+    manifest.json атомарно переключается на него. До этого они лежат в
+    staged/, чтобы прерванный прогон можно было возобновить.
+    """
+
+    def __init__(self, path, max_per_client=None, window_days=30, cooldown_days=0, product_cooldowns=None):
+        self.path = path
+        self.manifest_path = os.path.join(path, 'manifest.json')
+        self.staged_dir = os.path.join(path, 'staged')
+        self.max_per_client = max_per_client
+        self.window_days = window_days
+        self.cooldown_days = cooldown_days
+        self.product_cooldowns = product_cooldowns or {}
+        self.now = None
+        self.stats = dict.fromkeys(('checked', 'sent') + SUPPRESS_REASONS, 0)
+
+        os.makedirs(path, exist_ok=True)
+        manifest = self._read_manifest()
+        self.generation = manifest['generation']
+        self.products = {name: i for i, name in enumerate(manifest['products'])}
+        self.arrays = self._load_generation(self.generation)
+        # Принятые пуши (ключи, хэши): сохранённые в staged/ и с последней контрольной точки
+        self._staged = []
+        self._pending = []
+
+    @classmethod
+    def from_config(cls, path, config):
+        """Лимиты из раздела delivery конфига; cooldown_days продукта перекрывает общий"""
+        delivery = config.get('delivery', {})
+        product_cooldowns = {name: product['cooldown_days'] for name, product in config.get('products', {}).items()
+                             if 'cooldown_days' in product}
+        return cls(path,
+                   max_per_client=delivery.get('max_pushes_per_client'),
+                   window_days=delivery.get('frequency_window_days', 30),
+                   cooldown_days=delivery.get('cooldown_days', 0),
+                   product_cooldowns=product_cooldowns)
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {'generation': None, 'products': []}
+        if manifest.get('version') != HISTORY_VERSION:
+            raise ValueError(f"Несовместимая версия истории отправок в {self.path}")
+        return manifest
+
+    def _generation_dir(self, generation):
+        return os.path.join(self.path, f'gen-{generation:06d}')
+
+    def _load_generation(self, generation):
+        if generation is None:
+            return {name: np.empty(0, dtype=np.int64) for name in ARRAYS}
+        directory = self._generation_dir(generation)
+        return {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r') for name in ARRAYS}
+
+    def begin_run(self, now=None, resume=False):
+        """Начало прогона; при resume подхватываются пуши, принятые до обрыва"""
+        self.now = int((now or datetime.now()).timestamp())
+        self._staged, self._pending = [], []
+        if resume and os.path.isdir(self.staged_dir):
+            for name in sorted(os.listdir(self.staged_dir)):
+                if not name.endswith('.npz'):
+                    continue
+                with np.load(os.path.join(self.staged_dir, name)) as part:
+                    self._staged.append((part['key'], part['content_hash']))
+                    # Словарь продуктов только дополняется, поэтому порядок имён совпадает
+                    for product in part['products'].tolist():
+                        self.products.setdefault(product, len(self.products))
+        else:
+            shutil.rmtree(self.staged_dir, ignore_errors=True)
+
+        # Префиксные суммы отправок внутри окна по отсортированному sends
+        in_window = self.arrays['sends_at'] > self.now - self.window_days * DAY_SECONDS
+        self._window_counts = np.concatenate(([0], np.cumsum(in_window, dtype=np.int64)))
+
+    def _product_ids(self, products):
+        codes, names = pd.factorize(products)
+        for name in names:
+            if name not in self.products:
+                if len(self.products) >= PRODUCT_SLOTS:
+                    raise ValueError(f"В истории отправок не больше {PRODUCT_SLOTS} продуктов")
+                self.products[name] = len(self.products)
+        return np.array([self.products[name] for name in names], dtype=np.int64)[codes]
+
+    def filter(self, chunk):
+        """Строки блока, которые нужно отправить; они же запоминаются до commit_run()"""
+        if not len(chunk):
+            return chunk
+        if self.now is None:
+            self.begin_run()
+        codes = chunk['client_code'].to_numpy(dtype=np.int64)
+        products = chunk['product'].to_numpy()
+        keys = codes * PRODUCT_SLOTS + self._product_ids(products)
+        hashes = content_hashes(chunk)
+
+        found, last_hash = _align(self.arrays['latest_key'], self.arrays['latest_hash'], keys)
+        _, last_sent = _align(self.arrays['latest_key'], self.arrays['latest_sent'], keys)
+
+        cooldown = pd.Series(products).map(self.product_cooldowns).fillna(self.cooldown_days).to_numpy()
+        unchanged = found & (last_hash == hashes)
+        cooling = found & ~unchanged & (last_sent > self.now - cooldown * DAY_SECONDS)
+        capped = np.zeros(len(chunk), dtype=bool)
+        if self.max_per_client is not None:
+            sends_code = self.arrays['sends_code']
+            sent_count = (self._window_counts[np.searchsorted(sends_code, codes, 'right')]
+                          - self._window_counts[np.searchsorted(sends_code, codes, 'left')])
+            capped = ~unchanged & ~cooling & (sent_count >= self.max_per_client)
+        send = ~(unchanged | cooling | capped)
+
+        for reason, mask in zip(SUPPRESS_REASONS, (unchanged, cooling, capped)):
+            suppressed = int(mask.sum())
+            self.stats[reason] += suppressed
+            if suppressed:
+                metrics.count(f'push_suppressed_{reason}', suppressed)
+        self.stats['checked'] += len(chunk)
+        self.stats['sent'] += int(send.sum())
+
+        self._pending.append((keys[send], hashes[send]))
+        return chunk[send]
+
+    def checkpoint(self):
+        """Сохранение пушей, принятых с прошлой контрольной точки, для возобновления"""
+        if not self._pending:
+            return
+        part = (_concat(self._pending, 0), _concat(self._pending, 1))
+        os.makedirs(self.staged_dir, exist_ok=True)
+        path = os.path.join(self.staged_dir, f'part-{len(self._staged):05d}.npz')
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, key=part[0], content_hash=part[1], products=np.array(list(self.products), dtype=str))
+        os.replace(path + '.tmp', path)
+        self._staged.append(part)
+        self._pending = []
+
+    def commit_run(self):
+        """Новое поколение истории с принятыми пушами и без отправок старше окна"""
+        parts = self._staged + self._pending
+        keys, hashes = _concat(parts, 0), _concat(parts, 1)
+        # Клиент, повторно посчитанный после возобновления, - остаётся последняя запись
+        keys, last = np.unique(keys[::-1], return_index=True)
+        hashes = hashes[::-1][last]
+        sent_at = np.full(len(keys), self.now, dtype=np.int64)
+
+        old = self.arrays
+        kept = ~np.isin(old['latest_key'], keys, assume_unique=True)
+        latest_key = np.concatenate((old['latest_key'][kept], keys))
+        order = np.argsort(latest_key, kind='stable')
+        arrays = {
+            'latest_key': latest_key[order],
+            'latest_hash': np.concatenate((old['latest_hash'][kept], hashes))[order],
+            'latest_sent': np.concatenate((old['latest_sent'][kept], sent_at))[order],
+        }
+        # Внутри клиента sends упорядочены по времени: новые отправки встают после старых
+        kept = old['sends_at'] > self.now - self.window_days * DAY_SECONDS
+        sends_code = np.concatenate((old['sends_code'][kept], keys // PRODUCT_SLOTS))
+        order = np.argsort(sends_code, kind='stable')
+        arrays['sends_code'] = sends_code[order]
+        arrays['sends_at'] = np.concatenate((old['sends_at'][kept], sent_at))[order]
+
+        generation = 0 if self.generation is None else self.generation + 1
+        directory = self._generation_dir(generation)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, name + '.npy'), arrays[name])
+
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': HISTORY_VERSION,
+                'generation': generation,
+                'products': list(self.products),
+                'updated_at': datetime.fromtimestamp(self.now).isoformat()
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+        previous, self.generation = self.generation, generation
+        self.arrays = self._load_generation(generation)
+        self._staged, self._pending = [], []
+        shutil.rmtree(self.staged_dir, ignore_errors=True)
+        if previous is not None:
+            shutil.rmtree(self._generation_dir(previous), ignore_errors=True)
+
+
+class DeltaSink:
+    """Обёртка над OutputSink: в вывод попадают только пуши, прошедшие SendHistory"""
+
+    def __init__(self, sink, history, run_date=None):
+        self.sink = sink
+        self.history = history
+        self.run_date = run_date
+        self.path = sink.path
+        self.part_path = sink.part_path
+
+    @property
+    def signature(self):
+        return 'delta:' + self.sink.signature
+
+    def begin(self, offset=None):
+        self.history.begin_run(self.run_date, resume=offset is not None)
+        self.sink.begin(offset)
+
+    def write(self, chunk):
+        return self.sink.write(self.history.filter(chunk))
+
+    def checkpoint(self):
+        offset = self.sink.checkpoint()
+        self.history.checkpoint()
+        return offset
+
+    def commit(self):
+        self.sink.commit()
+        self.history.commit_run()
+
+    def close(self):
+        self.sink.close()
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime
+from urllib.parse import urlsplit
+import numpy as np
+from data_loader import DataLoader, TRANSACTIONS, TRANSFERS
+from data_processor import DataProcessor
+from feature_state import FeatureState
+from feature_store import FeatureStore
+from product_recommender import ProductRecommender
+from push_generator import PushGenerator
+from pipeline import DEFAULT_PRODUCT
+
+MAX_BATCH_SIZE = 10000
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class RecommendationService:
+    """Тёплое состояние сервиса: признаки клиентов, рекомендатель и генератор пушей.
+
+    Топ продуктов для всех клиентов считается пакетно при старте и после
+    изменения конфига или шаблонов, текст пуша рендерится по запросу из
+    ClientView, поэтому на клиента в памяти остаются только строка
+    FeatureStore и индексы топа продуктов.
+    """
+
+    def __init__(self, config_path, templates_path, store, top_n=4):
+        self.config_path = config_path
+        self.templates_path = templates_path
+        self.store = store
+        self.top_n = top_n
+        self.versions = None
+        # (ProductRecommender, PushGenerator, топ продуктов) текущей версии конфига
+        self.state = None
+        self.reload(force=True)
+
+    def _file_versions(self):
+        return tuple(os.stat(path).st_mtime_ns for path in (self.config_path, self.templates_path))
+
+    def _rebuild(self, recommender):
+        """Пакетный расчёт топа продуктов для всех клиентов"""
+        names = recommender.product_names + [DEFAULT_PRODUCT]
+        if recommender.product_names:
+            scores = recommender.score_batch(self.store)
+            top = recommender.top_products_batch(scores, self.top_n)
+            scores = np.take_along_axis(scores, top, axis=1)
+        else:
+            top = np.full((len(self.store), 1), len(names) - 1)
+            scores = np.zeros(top.shape)
+        return {
+            'names': names,
+            'top': top.astype(np.int16),
+            'scores': scores.astype(np.float32)
+        }
+
+    def reload(self, force=False):
+        """Перезагрузка конфига и шаблонов при изменении файлов"""
+        versions = None
+        try:
+            # Файл может на мгновение пропасть при подмене: это тоже ошибка перезагрузки
+            versions = self._file_versions()
+            if not force and versions == self.versions:
+                return False
+            recommender = ProductRecommender(self.config_path)
+            push_generator = PushGenerator(self.templates_path)
+            results = self._rebuild(recommender)
+        except Exception as e:
+            if force and self.state is None:
+                raise
+            print(f"Ошибка перезагрузки конфига или шаблонов, остаётся прежняя версия: {e}")
+            if versions is not None:
+                self.versions = versions
+            return False
+
+        # Подмена одной ссылкой: запросы видят либо старое, либо новое состояние
+        self.state = (recommender, push_generator, results)
+        self.versions = versions
+        return True
+
+    def recommend(self, client_code):
+        """Рекомендация для одного клиента или None, если клиента нет"""
+        view = self.store.view(client_code)
+        if view is None:
+            return None
+        _, push_generator, results = self.state
+        names = results['names']
+        top = results['top'][view.row].tolist()
+        product = names[top[0]]
+        return {
+            'client_code': client_code,
+            'product': product,
+            'push_notification': push_generator.generate_push(product, view, view, datetime.now()),
+            'top_products': [
+                {'product': names[index], 'score': score}
+                for index, score in zip(top, results['scores'][view.row].tolist())
+            ]
+        }
+
+    def recommend_many(self, client_codes):
+        results, missing = [], []
+        for client_code in client_codes:
+            result = self.recommend(client_code)
+            if result is None:
+                missing.append(client_code)
+            else:
+                results.append(result)
+        return {'results': results, 'missing': missing}
+
+
+def _response(status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    return head.encode('ascii') + body
+
+
+class HttpServer:
+    """Минимальный HTTP/1.1 сервер на asyncio с keep-alive"""
+
+    def __init__(self, service, reload_interval=1.0):
+        self.service = service
+        self.reload_interval = reload_interval
+
+    def route(self, method, path, body):
+        parts = urlsplit(path).path.strip('/').split('/')
+        if parts == ['health']:
+            return 200, {'status': 'ok', 'clients': len(self.service.store)}
+
+        if parts[0] != 'recommend' or len(parts) > 2:
+            return 404, {'error': 'not found'}
+
+        if len(parts) == 2:
+            if method != 'GET':
+                return 405, {'error': 'use GET'}
+            try:
+                client_code = int(parts[1])
+            except ValueError:
+                return 400, {'error': 'client_code must be an integer'}
+            result = self.service.recommend(client_code)
+            if result is None:
+                return 404, {'error': 'client not found', 'client_code': client_code}
+            return 200, result
+
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+        try:
+            client_codes = [int(code) for code in json.loads(body or b'{}')['client_codes']]
+        except (ValueError, KeyError, TypeError):
+            return 400, {'error': 'body must be {"client_codes": [int, ...]}'}
+        if len(client_codes) > MAX_BATCH_SIZE:
+            return 400, {'error': f'at most {MAX_BATCH_SIZE} client_codes per request'}
+        return 200, self.service.recommend_many(client_codes)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    writer.write(_response(400, {'error': 'bad request line'}))
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length') or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    # Без длины тела не найти начало следующего запроса: соединение закрывается
+                    writer.write(_response(400, {'error': 'bad content-length'}))
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, payload = self.route(method, path, body)
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                writer.write(_response(status, payload))
+                await writer.drain()
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def watch(self):
+        """Фоновая проверка изменений конфига и шаблонов"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            # Пересчёт идёт в потоке, чтобы не блокировать обработку запросов
+            if await loop.run_in_executor(None, self.service.reload):
+                print("Конфиг и шаблоны перезагружены")
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Сервис слушает http://{address[0]}:{address[1]}", flush=True)
+        watcher = asyncio.create_task(self.watch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+def load_features(args, processor, clients):
+    """Признаки из состояния daily_update.py или из файлов данных"""
+    if args.feature_state:
+        state = FeatureState.load(args.feature_state, processor.feature_engine)
+        return state.features(clients).to_frame()
+    data = DataLoader().load(args.data_dir, clients['client_code'].tolist())
+    return processor.preprocess_data(clients, data[TRANSACTIONS], data[TRANSFERS])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Сервис рекомендаций с тёплым состоянием")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--feature-state',
+                        help="Брать признаки из состояния daily_update.py")
+    parser.add_argument('--config', default='config/product_config.json')
+    parser.add_argument('--templates', default='templates/push_templates.json')
+    parser.add_argument('--reload-interval', type=float, default=1.0,
+                        help="Период проверки изменений конфига и шаблонов, секунды")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # Загрузка clients.csv как в main.py
+    from main import load_clients
+
+    args = parse_args(argv)
+    start = time.perf_counter()
+    processor = DataProcessor()
+    clients = load_clients(args.data_dir)
+    features = load_features(args, processor, clients)
+    # Признаки переносятся в компактное хранилище, DataFrame больше не нужен
+    store = FeatureStore.from_frame(features)
+    del clients, features
+    service = RecommendationService(args.config, args.templates, store)
+    print(f"Загружено клиентов: {len(store)} за {time.perf_counter() - start:.1f} с", flush=True)
+
+    try:
+        asyncio.run(HttpServer(service, args.reload_interval).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
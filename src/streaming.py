@@ -0,0 +1,206 @@
+import os
+import json
+import itertools
+import contextlib
+import hashlib
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data_loader import TRANSACTIONS, TRANSFERS
+from pipeline import output_columns
+from output_sinks import CsvSink
+
+# Состояние процесса-воркера: пайплайн и чтение файлов создаются один раз
+_worker_runner = None
+
+
+def clients_fingerprint(clients, shard_size, output_signature=''):
+    """Отпечаток набора клиентов, размера шарда и вида вывода для проверки при возобновлении"""
+    codes = np.ascontiguousarray(clients['client_code'].to_numpy(dtype=np.int64))
+    digest = hashlib.sha1(codes.tobytes())
+    digest.update(str(shard_size).encode())
+    digest.update(output_signature.encode())
+    return digest.hexdigest()
+
+
+def group_files_by_client(files):
+    """Файлы по client_code; файлы без кода в имени - под ключом None"""
+    groups = {}
+    for entry in files:
+        groups.setdefault(entry[2], []).append(entry)
+    return groups
+
+
+def _init_worker(options):
+    """Инициализация воркера: свои DataProcessor, ProductRecommender и PushGenerator"""
+    global _worker_runner
+    from data_cache import DataCache
+    from data_loader import DataLoader
+    from data_processor import DataProcessor
+    from product_recommender import ProductRecommender
+    from push_generator import PushGenerator
+    from pipeline import RecommendationPipeline
+
+    pipeline = RecommendationPipeline(
+        DataProcessor(),
+        ProductRecommender(options['config_path']),
+        PushGenerator(options['templates_path']),
+        top_n=options.get('top_n', 0)
+    )
+    # Внутри воркера параллелизм уже есть на уровне процессов
+    loader = DataLoader(workers=2)
+    if options.get('cache_dir'):
+        load_files = DataCache(options['cache_dir'], loader).load_files
+    else:
+        load_files = loader.load_files
+    _worker_runner = ShardedRunner(pipeline, load_files)
+
+
+def _run_shard_task(task):
+    """Полная цепочка для шарда в воркере; наружу уходят только колонки результата"""
+    index, client_columns, files, run_date = task
+    shard = pd.DataFrame(client_columns)
+    chunks = list(_worker_runner.run_shard(shard, files, run_date))
+    columns = output_columns(_worker_runner.pipeline.top_n)
+    result = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+    return index, {name: result[name].to_numpy() for name in columns}
+
+
+class ShardedRunner:
+    """Потоковый прогон по шардам клиентов с возобновлением после сбоя.
+
+    Для каждого шарда читаются только файлы его клиентов, затем строятся
+    признаки, скоринг и пуши, результат дописывается в вывод (OutputSink,
+    по умолчанию CSV) через <output>.part. После каждого шарда в
+    <output>.progress.json фиксируются номер шарда и контрольная точка
+    вывода; при возобновлении вывод откатывается к этой точке.
+    """
+
+    def __init__(self, pipeline, load_files, shard_size=None, workers=1, worker_options=None,
+                 feature_source=None):
+        self.pipeline = pipeline
+        # load_files(список файлов из DataLoader.scan) -> {тип: DataFrame}
+        self.load_files = load_files
+        # feature_source(шард) -> признаки шарда; если задан, файлы не читаются
+        self.feature_source = feature_source
+        self.shard_size = shard_size
+        # При workers > 1 шарды считаются в пуле процессов; worker_options -
+        # пути к конфигу, шаблонам и кэшу для сборки пайплайна в воркере
+        self.workers = workers
+        self.worker_options = worker_options
+        self.examples = []
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read_progress(self, progress_path, fingerprint):
+        try:
+            with open(progress_path, 'r', encoding='utf-8') as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if progress.get('fingerprint') != fingerprint:
+            print("Прогресс относится к другому набору клиентов, запуск с начала")
+            return None
+        return progress
+
+    def shards(self, clients):
+        shard_size = self.shard_size or max(len(clients), 1)
+        return [clients.iloc[start:start + shard_size] for start in range(0, len(clients), shard_size)]
+
+    @staticmethod
+    def shard_files(shard, file_groups):
+        """Файлы клиентов шарда и общие файлы без кода клиента"""
+        files = [entry for code in shard['client_code'].tolist() for entry in file_groups.get(code, [])]
+        files.extend(file_groups.get(None, []))
+        return files
+
+    def run_shard(self, shard, files, run_date=None):
+        """Признаки, скоринг и пуши для одного шарда"""
+        shard = shard.reset_index(drop=True)
+        if self.feature_source is not None:
+            features = self.feature_source(shard)
+        else:
+            data = self.load_files(files)
+            features = self.pipeline.build_features(shard, data[TRANSACTIONS], data[TRANSFERS])
+        return self.pipeline.iter_recommendations(shard, features, run_date)
+
+    def _iter_serial(self, shards, start, file_groups, run_date):
+        for index in range(start, len(shards)):
+            files = self.shard_files(shards[index], file_groups)
+            yield index, self.run_shard(shards[index], files, run_date)
+
+    def _iter_parallel(self, shards, start, file_groups, run_date):
+        """Шарды в пуле процессов; результаты возвращаются в порядке шардов.
+
+        В работе не больше 2 * workers шардов: новый отправляется только
+        после выдачи самого старого, поэтому медленный шард не копит в
+        родителе готовые результаты всех следующих.
+        """
+        tasks = ((index, shards[index].to_dict('list'), self.shard_files(shards[index], file_groups), run_date)
+                 for index in range(start, len(shards)))
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.worker_options,)) as pool:
+            pending = deque(pool.submit(_run_shard_task, task)
+                            for task in itertools.islice(tasks, 2 * self.workers))
+            while pending:
+                index, columns = pending.popleft().result()
+                yield index, [pd.DataFrame(columns)]
+                for task in itertools.islice(tasks, 1):
+                    pending.append(pool.submit(_run_shard_task, task))
+
+    def run(self, clients, files, output, resume=False, run_date=None):
+        """Прогон всех шардов; output - путь к CSV или OutputSink. Возвращает число записанных рекомендаций"""
+        if isinstance(output, str):
+            output = CsvSink(output, output_columns(self.pipeline.top_n))
+        # Месяц в пушах фиксируется один раз на весь прогон, в том числе для воркеров
+        run_date = run_date or datetime.now()
+        progress_path = output.path + '.progress.json'
+        fingerprint = clients_fingerprint(clients, self.shard_size, output.signature)
+        shards = self.shards(clients)
+        file_groups = group_files_by_client(files)
+
+        progress = self._read_progress(progress_path, fingerprint) if resume else None
+        if progress is not None and os.path.exists(output.part_path):
+            completed, total = progress['completed'], progress['rows']
+            output.begin(progress['offset'])
+            print(f"Возобновление с шарда {completed + 1} из {len(shards)}")
+        else:
+            completed, total = 0, 0
+            output.begin()
+
+        if self.workers > 1:
+            print(f"Параллельный прогон: {self.workers} процессов")
+            results = self._iter_parallel(shards, completed, file_groups, run_date)
+        else:
+            results = self._iter_serial(shards, completed, file_groups, run_date)
+
+        try:
+            for index, chunks in results:
+                print(f"Шард {index + 1}/{len(shards)}: {len(shards[index])} клиентов")
+                for chunk in chunks:
+                    # Считаются строки, попавшие в вывод: DeltaSink пропускает часть блока
+                    total += output.write(chunk)
+                    if len(self.examples) < 5:
+                        self.examples.extend(chunk.head(5 - len(self.examples)).to_dict('records'))
+
+                self._write_json(progress_path, {
+                    'fingerprint': fingerprint,
+                    'completed': index + 1,
+                    'offset': output.checkpoint(),
+                    'rows': total
+                })
+            output.commit()
+        finally:
+            output.close()
+
+        # Без обработанных шардов файл прогресса не создавался
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(progress_path)
+        return total
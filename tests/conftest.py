@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+DATA_DIR = os.path.join(ROOT, 'data')
+CONFIG_PATH = os.path.join(ROOT, 'config', 'product_config.json')
+
+
+@pytest.fixture(scope='session')
+def sample_data():
+    """Клиенты, транзакции и переводы из data/"""
+    from data_loader import DataLoader, TRANSACTIONS, TRANSFERS, find_clients_file
+
+    clients = pd.read_csv(find_clients_file(DATA_DIR))
+    data = DataLoader().load(DATA_DIR)
+    return clients, data[TRANSACTIONS], data[TRANSFERS]
+
+
+@pytest.fixture(scope='session')
+def recommender():
+    from product_recommender import ProductRecommender
+
+    return ProductRecommender(CONFIG_PATH)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processor import DataProcessor
+from product_recommender import SPENDING_CATEGORIES
+from scoring_rules import top_indices
+
+
+def reference_top_categories(client_data, n=3):
+    """Топ-N категорий трат одного клиента, как в прежнем _get_top_spending_categories"""
+    spending = {col: client_data.get(col, 0) for col in client_data.keys() if col in SPENDING_CATEGORIES}
+    return [name for name, _ in sorted(spending.items(), key=lambda item: item[1], reverse=True)[:n]]
+
+
+def assert_batch_matches_per_client(recommender, features):
+    scores = recommender.score_batch(features)
+    top = recommender.top_products_batch(scores, 4)
+    names = np.array(recommender.product_names, dtype=object)
+    for i, (_, client_data) in enumerate(features.iterrows()):
+        expected = recommender.calculate_product_scores(client_data)
+        assert scores[i].tolist() == [float(expected[name]) for name in recommender.product_names]
+        assert list(names[top[i]]) == recommender.recommend_top_products(client_data, 4)
+
+
+def assert_top_categories_match(features, n=3):
+    columns = [col for col in features.columns if col in SPENDING_CATEGORIES]
+    top = top_indices(features[columns].to_numpy(dtype=np.float64), n)
+    for i, (_, client_data) in enumerate(features.iterrows()):
+        assert [columns[j] for j in top[i]] == reference_top_categories(client_data, n)
+
+
+@pytest.fixture(scope='module')
+def sample_features(sample_data):
+    clients, transactions, transfers = sample_data
+    return DataProcessor().preprocess_data(clients, transactions, transfers)
+
+
+def edge_case_features():
+    """Нулевые траты, равные суммы на границе топа и клиенты без части категорий"""
+    return pd.DataFrame({
+        'client_code': [1, 2, 3, 4, 5],
+        'avg_monthly_balance_KZT': [0.0, 2500000.0, 800000.0, 1000000.0, 3000000.0],
+        'transaction_count': [0, 40, 11, 10, 25],
+        'total_spent': [0.0, 90000.0, 30000.0, 2500000.0, 60000.0],
+        'travel': [0.0, 20000.0, 10000.0, 0.0, 20000.0],
+        'taxi': [0.0, 20000.0, 10000.0, 0.0, 20000.0],
+        'restaurants': [0.0, 20000.0, 10000.0, 0.0, 0.0],
+        'groceries': [0.0, 30000.0, 0.0, 0.0, 20000.0],
+        'fx': [0.0, 150000.0, 100000.0, 0.0, 0.0],
+    })
+
+
+def test_sample_scores_match_per_client(recommender, sample_features):
+    assert_batch_matches_per_client(recommender, sample_features)
+
+
+def test_sample_top_categories_match_per_client(sample_features):
+    assert_top_categories_match(sample_features)
+
+
+def test_edge_case_scores_match_per_client(recommender):
+    assert_batch_matches_per_client(recommender, edge_case_features())
+
+
+def test_edge_case_top_categories_match_per_client():
+    features = edge_case_features()
+    assert_top_categories_match(features)
+    assert_top_categories_match(features, n=10)
+
+
+def test_missing_categories():
+    features = edge_case_features()[['client_code', 'avg_monthly_balance_KZT', 'transaction_count', 'total_spent']]
+    assert_top_categories_match(features)
+    assert top_indices(np.empty((len(features), 0)), 3).shape == (len(features), 0)
+
+
+def test_missing_categories_score_as_zero_spend(recommender):
+    features = edge_case_features()
+    missing = features.drop(columns=['travel', 'taxi', 'restaurants', 'groceries', 'fx'])
+    assert_batch_matches_per_client(recommender, missing)
+
+    zero = features.copy()
+    zero[['travel', 'taxi', 'restaurants', 'groceries', 'fx']] = 0.0
+    assert np.array_equal(recommender.score_batch(missing), recommender.score_batch(zero))
+
+
+def test_product_ties_keep_config_order(recommender):
+    scores = np.zeros((3, len(recommender.product_names)))
+    scores[1, [2, 5]] = 1000.0
+    scores[2] = 500.0
+    top = recommender.top_products_batch(scores, 4)
+    assert top.tolist() == [[0, 1, 2, 3], [2, 5, 0, 1], [0, 1, 2, 3]]
+
+
+def test_top_indices_ties_across_partition_boundary():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 4, size=(500, 24)).astype(np.float64)
+    expected = np.argsort(-values, axis=1, kind='stable')[:, :3]
+    assert np.array_equal(top_indices(values, 3), expected)
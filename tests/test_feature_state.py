@@ -0,0 +1,93 @@
+import os
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+import daily_update
+from data_loader import DataLoader, TRANSACTIONS, TRANSFERS
+from data_processor import DataProcessor
+from feature_state import FeatureState
+
+FOLD_DAYS = 20
+WINDOW_DAYS = 7
+
+
+@pytest.fixture(scope='module')
+def daily_files(sample_data, tmp_path_factory):
+    """Последние FOLD_DAYS дней данных: по файлу транзакций и переводов на день"""
+    _, transactions, transfers = sample_data
+    folder = tmp_path_factory.mktemp('daily')
+    last_day = transactions['date'].max().normalize()
+    days = [(last_day - timedelta(days=i)).date() for i in reversed(range(FOLD_DAYS))]
+    files = {}
+    for day in days:
+        files[day] = []
+        for kind, df in ((TRANSACTIONS, transactions), (TRANSFERS, transfers)):
+            path = os.path.join(folder, f'{kind}_{day}.csv')
+            df[(df['date'].dt.date == day).to_numpy()].to_csv(path, index=False)
+            files[day].append(path)
+    return files
+
+
+@pytest.fixture(scope='module')
+def state_path(daily_files, tmp_path_factory):
+    """Состояние после ежедневных запусков daily_update.py по одному дню"""
+    path = str(tmp_path_factory.mktemp('state') / 'feature_state.pkl')
+    for day_files in daily_files.values():
+        daily_update.main(day_files + ['--state', path, '--window-days', str(WINDOW_DAYS)])
+    return path
+
+
+def test_incremental_state_matches_full_recompute(sample_data, daily_files, state_path):
+    clients = sample_data[0]
+    processor = DataProcessor()
+    state = FeatureState.load(state_path, processor.feature_engine)
+    assert state.window_days == WINDOW_DAYS
+
+    window = list(daily_files)[-WINDOW_DAYS:]
+    loader = DataLoader()
+    data = loader.load_files(daily_update.collect_files(loader, [path for day in window for path in daily_files[day]]))
+    expected = processor.preprocess_data(clients, data[TRANSACTIONS], data[TRANSFERS])
+
+    pd.testing.assert_frame_equal(state.features(clients).to_frame(), expected, check_exact=False, rtol=1e-9)
+
+
+def test_load_without_state_file_fails(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        FeatureState.load(str(tmp_path / 'missing.pkl'), DataProcessor().feature_engine)
+
+
+def test_load_with_other_window_fails(state_path):
+    with pytest.raises(ValueError):
+        FeatureState.load(state_path, DataProcessor().feature_engine, window_days=WINDOW_DAYS + 1)
+
+
+def test_folding_same_file_twice_is_skipped(daily_files, tmp_path):
+    path = str(tmp_path / 'feature_state.pkl')
+    day_files = next(iter(daily_files.values()))
+    engine = DataProcessor().feature_engine
+
+    daily_update.main(day_files + ['--state', path])
+    once = FeatureState.load(path, engine)
+    daily_update.main(day_files + ['--state', path])
+    twice = FeatureState.load(path, engine)
+
+    assert set(twice.sources) == {os.path.abspath(file) for file in day_files}
+    assert (twice.totals.tx_sum == once.totals.tx_sum).all()
+    assert (twice.totals.tr_rows == once.totals.tr_rows).all()
+
+
+def test_folding_changed_file_fails(daily_files, tmp_path):
+    path = str(tmp_path / 'feature_state.pkl')
+    day_file = str(tmp_path / 'transactions.csv')
+    with open(next(iter(daily_files.values()))[0], 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    with open(day_file, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:-1])
+    daily_update.main([day_file, '--state', path])
+
+    with open(day_file, 'a', encoding='utf-8') as f:
+        f.write(lines[-1])
+    with pytest.raises(ValueError):
+        daily_update.main([day_file, '--state', path])
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from scoring_rules import RuleCompiler
+
+
+def compile_rule(rule):
+    return RuleCompiler().compile_product('Продукт', {'rule': rule})
+
+
+def assert_scalar_matches_vector(rule, clients):
+    columns = {name: np.array([client.get(name, 0) for client in clients], dtype=np.float64)
+               for name in rule.columns}
+    vector = rule.evaluate_batch(columns.__getitem__, len(clients))
+    scalar = [float(rule.evaluate(client)) for client in clients]
+    assert vector.tolist() == scalar
+
+
+CLIENTS = [{'x': 0.0, 'a': 5.0, 'y': 1.5}, {'x': 2.0, 'a': 5.0, 'y': 0.5}, {'x': -4.0, 'a': 0.0, 'y': 0.0}]
+
+
+@pytest.mark.parametrize('rule', [
+    {'score': {'div': ['a', 'x']}},
+    {'score': {'sum': [{'div': ['a', 'x']}, {'div': [10, 'y']}]}},
+    {'score': {'if': {'gt': ['x', 0]}, 'then': {'div': ['a', 'x']}, 'else': 0}},
+    {'when': {'and': [{'gt': ['x', 0]}, 'y']}, 'score': 'a'},
+    {'score': {'or': ['x', 'y']}},
+    {'score': {'not': 'y'}},
+])
+def test_scalar_and_vector_rules_agree(rule):
+    assert_scalar_matches_vector(compile_rule(rule), CLIENTS)
+
+
+def test_division_by_zero_scores_zero():
+    rule = compile_rule({'score': {'div': ['a', 'x']}})
+    assert rule.evaluate({'a': 5.0, 'x': 0.0}) == 0
+    assert rule.evaluate_batch({'a': np.array([5.0]), 'x': np.array([0.0])}.__getitem__, 1).tolist() == [0.0]